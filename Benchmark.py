@@ -0,0 +1,169 @@
+"""
+Plays many headless games of each game module through their real setup/move/show coroutines and reports throughput,
+per-move latency and (optionally) allocations, to catch regressions in the per-move hot paths before deploying.
+
+    python Benchmark.py                            # every game, 1000 games each
+    python Benchmark.py ConnectFour Gomoku -n 5000
+    python Benchmark.py Minesweeper --allocations
+    python Benchmark.py --memory                   # bytes each idle game keeps resident
+
+Moves are random, so many are rejected (full columns, taken cells); those still go through `move` and are timed.
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import random
+import time
+import tracemalloc
+
+from GameUtility import GameLogging
+from GameUtility import Journal
+from GameUtility import Metrics
+from GameUtility import Registry
+from GameUtility import WordIndex
+from GameUtility.Headless import create_game, current_player
+
+MAX_MOVES_PER_GAME = 5000
+# Moves played into each game before it is left idle for --memory
+IDLE_MOVES = 6
+
+
+def _word_play_move(game, rng):
+    words = game._GameObject__words
+    if not words:
+        return [rng.choice(sorted(WordIndex.get_index()))]
+    plays = sorted(WordIndex.get_graph().neighbours(words[-1]) - set(words))
+    return [rng.choice(plays)] if plays else ['nope']
+
+
+# module name -> (number of players, setup args, function returning the args of a random move)
+GAMES = {
+    'ConnectFour': (2, [], lambda game, rng: [rng.randint(1, 7)]),
+    'Gomoku': (2, [], lambda game, rng: [rng.randint(1, 10), rng.randint(1, 10)]),
+    'TicTacToe': (2, [], lambda game, rng: [rng.randint(1, 3), rng.randint(1, 3)]),
+    'Minesweeper': (1, ['ms', 9, 10], lambda game, rng: [rng.randint(1, 9), rng.randint(1, 9)]),
+    'WordPlay': (2, [], _word_play_move),
+    'RussianRoulette': (3, [], lambda game, rng: []),
+}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_game(cls, players, setup_args, next_move, rng, latencies):
+    game, channel = create_game(cls, players, keep_history=False)
+    await game.setup(list(setup_args))
+    moves = 0
+    while not game.ended and moves < MAX_MOVES_PER_GAME:
+        args = next_move(game, rng)
+        player = current_player(game)
+        start = time.perf_counter()
+        await game.move(args, player)
+        latencies.append(time.perf_counter() - start)
+        moves += 1
+    return channel.sends + channel.edits
+
+
+async def benchmark(name, games, seed, allocations):
+    players, setup_args, next_move = GAMES[name]
+    cls = Registry.load(name)
+    rng = random.Random(seed)
+    random.seed(seed)
+    latencies = []
+    api_calls = 0
+    if allocations:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(games):
+        api_calls += await run_game(cls, players, setup_args, next_move, rng, latencies)
+    elapsed = time.perf_counter() - start
+    result = {
+        'game': name,
+        'games': games,
+        'moves': len(latencies),
+        'moves/s': len(latencies) / elapsed if elapsed else 0.0,
+        'api calls/move': api_calls / len(latencies) if latencies else 0.0,
+    }
+    ordered = sorted(latencies) or [0.0]
+    for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        result[label + ' us'] = percentile(ordered, fraction) * 1e6
+    result['max us'] = ordered[-1] * 1e6
+    if allocations:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak KiB'] = peak / 1024
+    return result
+
+
+async def measure_memory(name, games, seed):
+    """
+    Set up `games` games, play a few moves into each and keep them all, like a shard full of idle games. Reports the
+    bytes each game holds on to, including its stand-in channel and players.
+    """
+    players, setup_args, next_move = GAMES[name]
+    cls = Registry.load(name)
+    rng = random.Random(seed)
+    random.seed(seed)
+    # Warm the caches every game shares (the word index, neighbour tables, ...) so they aren't counted per game
+    await run_game(cls, players, setup_args, next_move, rng, [])
+    kept = []
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(games):
+        game, _ = create_game(cls, players, keep_history=False)
+        await game.setup(list(setup_args))
+        for _ in range(IDLE_MOVES):
+            if game.ended:
+                break
+            await game.move(next_move(game, rng), current_player(game))
+        kept.append(game)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'game': name, 'games': games, 'bytes/game': (after - before) / games}
+
+
+def print_table(results):
+    columns = list(results[0])
+    rows = [[value if isinstance(value, str) else '{:,.1f}'.format(value) if isinstance(value, float) else '{:,}'.format(value) for value in result.values()] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print('  '.join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the games headlessly')
+    parser.add_argument('games', nargs='*', metavar='game', help='game modules to run: {} (default: all)'.format(', '.join(GAMES)))
+    parser.add_argument('-n', '--count', type=int, default=1000, help='games to play per module')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for reproducible runs')
+    parser.add_argument('--allocations', action='store_true', help='trace allocations (slower) and report peak memory')
+    parser.add_argument('--memory', action='store_true', help='report the memory each idle game keeps instead of timing moves')
+    parser.add_argument('--log-level', default='WARNING', help='level for the game loggers while benchmarking')
+    parser.add_argument('--journal', metavar='PATH', help='record every move to a journal at PATH (default: no journal)')
+    parser.add_argument('--metrics', action='store_true', help='also print the games\' own metrics in Prometheus text format')
+    options = parser.parse_args()
+    unknown = [name for name in options.games if name not in GAMES]
+    if unknown:
+        parser.error('unknown game(s): {}'.format(', '.join(unknown)))
+
+    GameLogging.set_level(getattr(logging, options.log_level.upper()))
+    if options.journal:
+        Journal.enable(options.journal)
+    else:
+        Journal.disable()
+    if options.memory:
+        results = [asyncio.run(measure_memory(name, options.count, options.seed)) for name in options.games or GAMES]
+    else:
+        results = [asyncio.run(benchmark(name, options.count, options.seed, options.allocations)) for name in options.games or GAMES]
+    print_table(results)
+    if options.metrics:
+        print()
+        print(Metrics.to_prometheus(), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import types
+
+# Token colours players may pick in games that let them, by name. Read-only, as every game shares it.
+TOKENS = types.MappingProxyType({
+    "blue": "🔵",
+    "red": "🔴",
+    "green": "🟢",
+    "orange": "🟠",
+    "purple": "🟣",
+    "yellow": "🟡",
+    "white": "⚪",
+    "brown": "🟤",
+})
+
+
+class GridBoard:
+    """
+    A rectangular board of small integer cell codes backed by a bytearray.
+
+    Every code is an index into `tokens`, the emoji drawn for that cell, so the board only becomes an emoji string
+    when `render()` is called from a game's `show()`. Code 0 is always the empty cell.
+
+    The rendered text of every row is cached and only rebuilt for rows changed since the last render, so always
+    write cells through `set()`.
+    """
+
+    EMPTY = 0
+
+    __slots__ = ('width', 'height', 'tokens', 'cells', '_rows')
+
+    def __init__(self, width, height, tokens):
+        self.width = width
+        self.height = height
+        self.tokens = list(tokens)
+        self.cells = bytearray(width * height)
+        self._rows = [None] * height
+
+    def add_token(self, token):
+        """
+        Register an emoji with the board (if it isn't already) and return its cell code
+        """
+        if token not in self.tokens:
+            self.tokens.append(token)
+        return self.tokens.index(token)
+
+    def is_valid(self, col, row):
+        return 0 <= col < self.width and 0 <= row < self.height
+
+    def get(self, col, row):
+        return self.cells[row * self.width + col]
+
+    def set(self, col, row, code):
+        self.cells[row * self.width + col] = code
+        self._rows[row] = None
+
+    def is_empty(self, col, row):
+        return self.cells[row * self.width + col] == self.EMPTY
+
+    def get_token(self, col, row):
+        return self.tokens[self.cells[row * self.width + col]]
+
+    def render(self):
+        tokens = self.tokens
+        width = self.width
+        rows = self._rows
+        for row, text in enumerate(rows):
+            if text is None:
+                rows[row] = ''.join([tokens[code] for code in self.cells[row * width:(row + 1) * width]])
+        return '\n' + '\n'.join(rows) + '\n'
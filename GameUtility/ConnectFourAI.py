@@ -0,0 +1,214 @@
+import functools
+import random
+import time
+from collections import OrderedDict
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# Score for a window of `run_length` cells holding 0, 1, 2, ... tokens of one player and none of the other, long
+# enough for the longest run a ConnectFour game can be set up with
+WINDOW_WEIGHTS = (0, 1) + tuple(4 * 8 ** i for i in range(11))
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """
+    A bounded map of Zobrist key -> (depth, score, bound, best column). Once it holds `max_entries` positions the
+    least recently used one is evicted, so a long game can't grow the table without limit.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def shrink(self, entries):
+        """
+        Drop all but the `entries` most recently used positions
+        """
+        while len(self.entries) > entries:
+            self.entries.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=None)
+def _zobrist_keys(cells, seed):
+    rng = random.Random(seed)
+    return tuple(tuple(rng.getrandbits(64) for _ in range(cells)) for _ in range(2))
+
+
+@functools.lru_cache(maxsize=None)
+def _windows(width, height, run_length):
+    stride = height + 1
+    windows = []
+    for col in range(width):
+        for row in range(height):
+            for dcol, drow in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                end_col, end_row = col + dcol * (run_length - 1), row + drow * (run_length - 1)
+                if not (0 <= end_col < width and 0 <= end_row < height):
+                    continue
+                mask = 0
+                for i in range(run_length):
+                    mask |= 1 << ((col + dcol * i) * stride + row + drow * i)
+                windows.append(mask)
+    return tuple(windows)
+
+
+class ConnectFourSearcher:
+    """
+    Two player negamax with alpha-beta pruning over a ConnectFourBitboard.
+
+    `best_move` deepens one ply at a time until the time budget runs out and answers with the best column of the
+    deepest finished search. Columns are tried best-known first (from the transposition table), then from the center
+    outwards. The searcher keeps its transposition table between calls, so build one per game and reuse it.
+
+    The Zobrist keys and scoring windows only depend on the board size (and `seed`), so searchers of the same size
+    share them.
+    """
+
+    def __init__(self, width=7, height=6, run_length=4, table_size=100000, seed=None):
+        self.width = width
+        self.height = height
+        self.run_length = run_length
+        self.stride = height + 1
+        self.table = TranspositionTable(table_size)
+        self.center_order = sorted(range(width), key=lambda col: (abs(2 * col - (width - 1)), col))
+        self.zobrist = _zobrist_keys(width * self.stride, seed)
+        self.windows = _windows(width, height, run_length)
+        # A win (less the moves it took) must outscore any position `evaluate` can see, where no window is complete
+        self.win_score = len(self.windows) * WINDOW_WEIGHTS[run_length - 1] + width * height + 1
+        self.nodes = 0
+        self._deadline = 0
+
+    def hash(self, engine):
+        key = 0
+        for player in range(2):
+            board = engine.boards[player]
+            while board:
+                low = board & -board
+                key ^= self.zobrist[player][low.bit_length() - 1]
+                board ^= low
+        return key
+
+    def evaluate(self, engine, player):
+        mine, theirs = engine.boards[player], engine.boards[1 - player]
+        score = 0
+        for window in self.windows:
+            own = bin(window & mine).count('1')
+            other = bin(window & theirs).count('1')
+            if other == 0:
+                score += WINDOW_WEIGHTS[own]
+            elif own == 0:
+                score -= WINDOW_WEIGHTS[other]
+        return score
+
+    def best_move(self, engine, player, time_budget=1.0):
+        """
+        Return the column `player` should drop in. `engine` is played on and undone during the search, so pass a copy
+        if anything else may look at it meanwhile.
+        """
+        self._deadline = time.monotonic() + time_budget
+        self.nodes = 0
+        key = self.hash(engine)
+        legal = [col for col in self.center_order if not engine.is_column_full(col)]
+        best = legal[0]
+        for col in legal:
+            engine.drop(col, player)
+            won = engine.is_win(player)
+            engine.undo(col)
+            if won:
+                return col
+        for depth in range(1, self.width * self.height - engine.moves + 1):
+            try:
+                score, col = self._search_root(engine, player, depth, key)
+            except SearchTimeout:
+                break
+            best = col
+            if abs(score) >= self.win_score - self.width * self.height:
+                break
+        return best
+
+    def _search_root(self, engine, player, depth, key):
+        alpha, beta = -self.win_score - 1, self.win_score + 1
+        best_score, best_col = -self.win_score - 1, None
+        for col in self._ordered_columns(engine, key):
+            bit = col * self.stride + engine.heights[col]
+            engine.drop(col, player)
+            score = -self._negamax(engine, 1 - player, depth - 1, -beta, -alpha, key ^ self.zobrist[player][bit])
+            engine.undo(col)
+            if score > best_score:
+                best_score, best_col = score, col
+            alpha = max(alpha, score)
+        self.table.put(key, (depth, best_score, EXACT, best_col))
+        return best_score, best_col
+
+    def _ordered_columns(self, engine, key):
+        entry = self.table.get(key)
+        columns = [col for col in self.center_order if not engine.is_column_full(col)]
+        if entry is not None and entry[3] in columns:
+            columns.remove(entry[3])
+            columns.insert(0, entry[3])
+        return columns
+
+    def _negamax(self, engine, player, depth, alpha, beta, key):
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.monotonic() > self._deadline:
+            raise SearchTimeout()
+
+        # The previous move was the other player's, so only they can have just won
+        if engine.is_win(1 - player):
+            return -(self.win_score - engine.moves)
+        if engine.is_full():
+            return 0
+        if depth == 0:
+            return self.evaluate(engine, player)
+
+        original_alpha = alpha
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            entry_depth, entry_score, entry_bound, _ = entry
+            if entry_bound == EXACT:
+                return entry_score
+            elif entry_bound == LOWER_BOUND:
+                alpha = max(alpha, entry_score)
+            else:
+                beta = min(beta, entry_score)
+            if alpha >= beta:
+                return entry_score
+
+        best_score, best_col = -self.win_score - 1, None
+        for col in self._ordered_columns(engine, key):
+            bit = col * self.stride + engine.heights[col]
+            engine.drop(col, player)
+            score = -self._negamax(engine, 1 - player, depth - 1, -beta, -alpha, key ^ self.zobrist[player][bit])
+            engine.undo(col)
+            if score > best_score:
+                best_score, best_col = score, col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.put(key, (depth, best_score, bound, best_col))
+        return best_score
@@ -0,0 +1,108 @@
+class ConnectFourBitboard:
+    """
+    ConnectFour rules on bitboards: one integer per player with a bit set for every token they own, plus the height
+    of every column.
+
+    Each column takes `height + 1` bits, bottom row first, and the spare bit on top of every column keeps runs from
+    wrapping into the next column. On the standard 7x6 board the whole position fits in 49 bits, so dropping a token,
+    checking a column and checking for a win are all a handful of shifts and ANDs.
+
+    Rows handed back to callers count from the top of the board, the same way GridBoard does.
+    """
+
+    __slots__ = ('width', 'height', 'run_length', 'stride', 'boards', 'heights', 'moves', 'bottom_mask', 'board_mask', 'shifts')
+
+    def __init__(self, players=2, width=7, height=6, run_length=4):
+        self.width = width
+        self.height = height
+        self.run_length = run_length
+        self.stride = height + 1
+        self.boards = [0] * players
+        self.heights = [0] * width
+        self.moves = 0
+        self.bottom_mask = sum(1 << (col * self.stride) for col in range(width))
+        self.board_mask = self.bottom_mask * ((1 << height) - 1)
+        self.shifts = (1, self.stride, self.stride - 1, self.stride + 1)
+
+    @property
+    def mask(self):
+        mask = 0
+        for board in self.boards:
+            mask |= board
+        return mask
+
+    def is_column_full(self, col):
+        return self.heights[col] == self.height
+
+    def is_full(self):
+        return self.moves == self.width * self.height
+
+    def playable(self):
+        """
+        Bitmask of the cells a token would land in, one per column that isn't full
+        """
+        return (self.mask + self.bottom_mask) & self.board_mask
+
+    def legal_columns(self):
+        return [col for col in range(self.width) if self.heights[col] < self.height]
+
+    def drop(self, col, player):
+        """
+        Drop `player`'s token in `col` and return the row (from the top) it landed in
+        """
+        row = self.heights[col]
+        self.boards[player] |= 1 << (col * self.stride + row)
+        self.heights[col] = row + 1
+        self.moves += 1
+        return self.height - 1 - row
+
+    def undo(self, col):
+        """
+        Take the top token back out of `col`
+        """
+        row = self.heights[col] - 1
+        bit = 1 << (col * self.stride + row)
+        for player, board in enumerate(self.boards):
+            if board & bit:
+                self.boards[player] = board ^ bit
+                break
+        self.heights[col] = row
+        self.moves -= 1
+
+    def _run_starts(self, board, shift):
+        starts = board
+        for i in range(1, self.run_length):
+            starts &= board >> (i * shift)
+        return starts
+
+    def is_win(self, player):
+        board = self.boards[player]
+        for shift in self.shifts:
+            if self._run_starts(board, shift):
+                return True
+        return False
+
+    def winning_cells(self, player):
+        """
+        Return every (col, row) cell that is part of one of `player`'s winning runs
+        """
+        board = self.boards[player]
+        bits = 0
+        for shift in self.shifts:
+            starts = self._run_starts(board, shift)
+            for i in range(self.run_length):
+                bits |= starts << (i * shift)
+        cells = []
+        while bits:
+            low = bits & -bits
+            col, row = divmod(low.bit_length() - 1, self.stride)
+            cells.append((col, self.height - 1 - row))
+            bits ^= low
+        return cells
+
+    def copy(self):
+        engine = ConnectFourBitboard(len(self.boards), self.width, self.height, self.run_length)
+        engine.boards = list(self.boards)
+        engine.heights = list(self.heights)
+        engine.moves = self.moves
+        return engine
@@ -0,0 +1,252 @@
+"""
+Moves idle games out of memory and brings them back when they are played again.
+
+Once `start()` has been called from the bot's event loop, every running game is looked at every SWEEP_SECONDS:
+
+* a game left alone for its IDLE_SECONDS is snapshotted into a SQLite store at STORE_PATH and its state dropped,
+  leaving a shell of its players, channel and counters;
+* a game left alone for its ABANDON_SECONDS is ended with its ABANDON_NOTICE in its channel.
+
+The next move, or anything else that reads the game's state, loads it back from the store first, so neither the bot
+nor the game has to know it was ever gone. Both limits are GameBase class attributes that a game type can override,
+or set to None to keep its games resident.
+
+A setup or move loads its game back with the store read in an executor. Anything else that reads an evicted game's
+state (its attributes, outside a step) loads it in line instead, which is a single primary key lookup but blocks the
+event loop for it. Sweeps write the store from an executor, in one transaction.
+
+Snapshots are only ever loaded back into the game objects they came from, so `start()` empties the store of anything
+a previous run of the bot left in it.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+from GameUtility import Metrics
+from GameUtility.GameLogging import get_logger
+
+logger = get_logger(__name__)
+
+STORE_PATH = '../data/evicted.db'
+SWEEP_SECONDS = 60
+
+_games = weakref.WeakSet()
+_store = None
+_task = None
+
+
+class GameStore:
+    """
+    Snapshots of evicted games in SQLite, keyed by game id. Safe to use from several threads.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS games (game_id TEXT PRIMARY KEY, game TEXT NOT NULL, channel INTEGER, evicted REAL NOT NULL, data BLOB NOT NULL)')
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+    def put_many(self, games):
+        """
+        Store (game id, game name, channel id, snapshot) rows, replacing any already stored for those games
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?)', [(_key(game_id), name, channel, now, data) for game_id, name, channel, data in games])
+
+    def get(self, game_id):
+        with self._lock:
+            row = self._connection.execute('SELECT data FROM games WHERE game_id = ?', (_key(game_id),)).fetchone()
+        return None if row is None else row[0]
+
+    def delete(self, game_id):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM games WHERE game_id = ?', (_key(game_id),))
+
+    def clear(self):
+        """
+        Remove every stored snapshot, returning how many there were
+        """
+        with self._lock, self._connection:
+            return self._connection.execute('DELETE FROM games').rowcount
+
+    def take(self, game_id):
+        """
+        Remove and return the snapshot of a game, or None if it isn't stored
+        """
+        with self._lock, self._connection:
+            key = _key(game_id)
+            row = self._connection.execute('SELECT data FROM games WHERE game_id = ?', (key,)).fetchone()
+            self._connection.execute('DELETE FROM games WHERE game_id = ?', (key,))
+        return None if row is None else row[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _key(game_id):
+    # Game ids are unsigned 64 bit, which SQLite integers are not
+    return '{:016x}'.format(game_id)
+
+
+def get_store():
+    """
+    The store evicted games go to, opened at STORE_PATH on first use
+    """
+    global _store
+    if _store is None:
+        _store = GameStore()
+    return _store
+
+
+def track(game):
+    """
+    Start watching a running game. GameBase calls this when a setup succeeds or a snapshot is restored.
+    """
+    _games.add(game)
+
+
+def forget(game):
+    """
+    Stop watching a game that ended, bringing it back first if it was evicted so it ends with all its state
+    """
+    if game._evicted:
+        game._rehydrate()
+    _games.discard(game)
+
+
+def tracked():
+    return len(_games)
+
+
+def take(game):
+    return get_store().take(game._game_id)
+
+
+async def rehydrate(game):
+    """
+    Load an evicted game back, reading and clearing its row in an executor. GameBase does this before a step.
+    """
+    loop = asyncio.get_running_loop()
+    store = get_store()
+    data = await loop.run_in_executor(None, store.get, game._game_id)
+    # Something may have read the game's state, and so loaded it in line, in the meantime
+    if game._evicted:
+        game._rehydrate(data)
+    await loop.run_in_executor(None, store.delete, game._game_id)
+
+
+async def sweep(now=None):
+    """
+    Evict every game idle past its IDLE_SECONDS and end every game idle past its ABANDON_SECONDS. Returns the number
+    of games evicted and ended.
+    """
+    now = time.monotonic() if now is None else now
+    idle, abandoned = [], []
+    for game in list(_games):
+        if game._step_lock is not None and game._step_lock.locked():
+            # In the middle of a setup or move, or one is waiting to start
+            continue
+        quiet = now - game._last_active
+        if game.ABANDON_SECONDS is not None and quiet >= game.ABANDON_SECONDS:
+            abandoned.append(game)
+        elif game.IDLE_SECONDS is not None and quiet >= game.IDLE_SECONDS and not game._evicted:
+            idle.append(game)
+
+    # Each game is only touched while holding its step lock, so no setup or move runs in the middle. The games may
+    # have been played while earlier ones were being dealt with, so they are checked again once it is held.
+    loop = asyncio.get_running_loop()
+    ended = 0
+    for game in abandoned:
+        async with game._get_step_lock():
+            if game not in _games or now - game._last_active < game.ABANDON_SECONDS:
+                continue
+            logger.info('Ending abandoned {} game {:016x}'.format(game.get_game_name(), game._game_id))
+            try:
+                if game._evicted:
+                    await rehydrate(game)
+                await game._abandon()
+                ended += 1
+            except Exception:
+                logger.warning('Could not end abandoned game {:016x}'.format(game._game_id), exc_info=True)
+                _games.discard(game)
+
+    # The locks of the idle games are held until their snapshots are stored and their state dropped; a move that
+    # arrives meanwhile waits for that, then loads the game back
+    held = []
+    snapshots = []
+    try:
+        for game in idle:
+            lock = game._get_step_lock()
+            await lock.acquire()
+            held.append(lock)
+            if game._evicted or game not in _games or now - game._last_active < game.IDLE_SECONDS:
+                continue
+            try:
+                snapshots.append((game, game.snapshot()))
+            except NotImplementedError:
+                # Games without snapshots stay resident
+                _games.discard(game)
+        if snapshots:
+            store = get_store()
+            rows = [(game._game_id, game.get_game_short_name(), getattr(game.channel, 'id', None), data) for game, data in snapshots]
+            await loop.run_in_executor(None, store.put_many, rows)
+            for game, _ in snapshots:
+                if game in _games:
+                    game._drop_state()
+                    if Metrics.is_enabled():
+                        Metrics.for_game(game.get_game_name()).count('games_evicted')
+                else:
+                    # Ended outside a step while its snapshot was being written
+                    await loop.run_in_executor(None, store.delete, game._game_id)
+    finally:
+        for lock in held:
+            lock.release()
+    return len(snapshots), ended
+
+
+async def _sweep_forever(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            evicted, ended = await sweep()
+            if evicted or ended:
+                logger.info('Evicted {} idle games and ended {} abandoned games'.format(evicted, ended))
+        except Exception:
+            logger.warning('Idle game sweep failed', exc_info=True)
+
+
+def start(path=STORE_PATH, interval=SWEEP_SECONDS):
+    """
+    Open the store at `path`, dropping any games left in it, and sweep every `interval` seconds on the running event
+    loop. Returns the sweeping task.
+    """
+    global _store, _task
+    stop()
+    _store = GameStore(path)
+    # Games evicted by an earlier run can't be played again, their game objects are gone
+    dropped = _store.clear()
+    if dropped:
+        logger.info('Dropped {} games left in the eviction store by an earlier run'.format(dropped))
+    _task = asyncio.get_running_loop().create_task(_sweep_forever(interval))
+    return _task
+
+
+def stop():
+    """
+    Stop sweeping. Games already evicted are still loaded back from the store when played.
+    """
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
@@ -0,0 +1,384 @@
+import asyncio
+import contextlib
+import functools
+import os
+import time
+
+from GameParent import Game, SetupFailure, SetupSuccess
+from GameUtility import Eviction
+from GameUtility import Journal
+from GameUtility import Metrics
+from GameUtility.GameLogging import get_logger
+from GameUtility.Outbox import Outbox
+from GameUtility.Snapshot import SnapshotError, SnapshotReader, SnapshotWriter
+
+logger = get_logger(__name__)
+
+# GameBase's own bookkeeping, which an evicted game keeps even when it is first set during setup
+SHELL_ATTRIBUTES = frozenset(('_moves_handled', '_moves_rejected', '_game_id', '_journal_seq', '_board_message', '_board_hash', '_last_active', '_evicted', '_step_lock', '_step_task', '_counting_move'))
+
+
+def _batched(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self._step_task is not None and self._step_task is asyncio.current_task():
+            # Called from within the step this task is already running, e.g. a bot move made from within `move`
+            return await method(self, *args, **kwargs)
+        # Steps of one game run one at a time, in the order they arrive
+        async with self._get_step_lock():
+            self._step_task = asyncio.current_task()
+            try:
+                return await _step(self, method, args, kwargs)
+            finally:
+                self._step_task = None
+    return wrapper
+
+
+async def _step(self, method, args, kwargs):
+    if self._evicted:
+        await Eviction.rehydrate(self)
+    self._last_active = time.monotonic()
+    self._counting_move = method.__name__ == 'move'
+    if self._counting_move:
+        self._moves_handled += 1
+    else:
+        self._game_id = int.from_bytes(os.urandom(8), 'little')
+    self._outbox = Outbox()
+    self._journal = []
+    self._send_time = 0
+    start = time.perf_counter()
+    result = None
+    before = set(vars(self))
+    try:
+        result = await method(self, *args, **kwargs)
+        return result
+    finally:
+        if method.__name__ == 'setup':
+            self._state_attributes = frozenset(vars(self).keys() - before - SHELL_ATTRIBUTES)
+        outbox, self._outbox = self._outbox, None
+        await outbox.flush(self._channel_send, self._show_board)
+        self._write_journal(method.__name__, result)
+        self._record_step(method.__name__, time.perf_counter() - start, result)
+        if isinstance(result, SetupSuccess):
+            Eviction.track(self)
+
+
+def _timed(method, histogram):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if not Metrics.is_enabled():
+            return await method(self, *args, **kwargs)
+        sent, start = self._send_time, time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            Metrics.for_game(self.get_game_name()).observe(histogram, time.perf_counter() - start - (self._send_time - sent))
+    return wrapper
+
+
+class GameBase(Game):
+    """
+    A Game whose outbound messages are batched. Anything sent with `await self.send(...)` while `setup` or `move` is
+    running is held back and goes out as as few messages as possible when that call returns, instead of one API call
+    per line.
+
+    Subclasses just define `setup` and `move` as usual; they are wrapped automatically. Calls for the same game are
+    run one at a time, so a move never starts while another is still awaiting the channel.
+
+    Boards should be sent with `send_board`. With EDIT_BOARD_IN_PLACE set, the game keeps one board message and edits
+    it every turn rather than posting a new one, and skips the edit entirely when the board text hasn't changed.
+
+    `setup`, `move` and `show` are timed into GameUtility.Metrics under the game's name, with time spent awaiting the
+    channel kept apart from time spent in the game itself. Illegal moves should be answered with `reject` so they are
+    counted, commands that don't play a move (hints, say) should call `_not_a_move` so they aren't, and win checks can
+    be timed with `with self.measure('win_check_seconds'): ...`.
+
+    `snapshot()` packs a running game into a few hundred bytes and `restore()` loads one into a freshly created game
+    object, so games can outlive the process. Subclasses write and read their own state in `_save_state` and
+    `_load_state`.
+
+    Every accepted move is appended to GameUtility.Journal: subclasses call `_journal_move` when a move is applied
+    (by a player or the bot), list their setup options in `_journal_params`, and rebuild a bare state from the moves
+    in a static `replay`.
+
+    Games idle for IDLE_SECONDS are moved out of memory into a store by GameUtility.Eviction, once its sweeper has
+    been started, and are loaded back as soon as anything touches their state. Games idle for ABANDON_SECONDS are
+    ended with ABANDON_NOTICE. This relies on snapshots, so games without them always stay in memory.
+    """
+
+    EDIT_BOARD_IN_PLACE = False
+
+    # Seconds without a setup or move before the game is evicted, and before it is ended as abandoned (None for never)
+    IDLE_SECONDS = 30 * 60
+    ABANDON_SECONDS = 7 * 24 * 60 * 60
+    ABANDON_NOTICE = 'This game has been left alone for too long and has ended.'
+
+    _outbox = None
+    # Serialises the game's setup and moves, and the task running the current one
+    _step_lock = None
+    _step_task = None
+    _board_message = None
+    # Only the hash of the last board sent is kept, to skip edits that change nothing without holding a copy of
+    # the board text in every idle game
+    _board_hash = None
+    _send_time = 0
+    _moves_handled = 0
+    # Whether the running step is a move that counts as one, see `_not_a_move`
+    _counting_move = False
+    _moves_rejected = 0
+    _game_id = 0
+    _journal = None
+    _journal_seq = 0
+    _last_active = 0.0
+    _evicted = False
+    # Names of the attributes this game's own setup (or snapshot restore) created, which are all eviction drops.
+    # Anything GameParent or the bot sets on the game is left alone.
+    _state_attributes = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in ('setup', 'move'):
+            if name in cls.__dict__:
+                setattr(cls, name, _batched(cls.__dict__[name]))
+        if 'show' in cls.__dict__:
+            cls.show = _timed(cls.__dict__['show'], 'show_seconds')
+
+    async def send(self, content):
+        """
+        Send `content` to the game's channel, batched with everything else sent during the current step
+        """
+        if self._outbox is None:
+            return await self._channel_send(content)
+        self._outbox.add(content)
+
+    async def reject(self, content):
+        """
+        Turn down an illegal or malformed move, telling the players why with `content`
+        """
+        self._moves_rejected += 1
+        if Metrics.is_enabled():
+            Metrics.for_game(self.get_game_name()).count('rejected_moves')
+        await self.send(content)
+
+    def _not_a_move(self):
+        """
+        Mark the `move` call being handled as a command that doesn't play a move (asking for a hint, say), so it isn't
+        counted or timed as one
+        """
+        if self._counting_move:
+            self._counting_move = False
+            self._moves_handled -= 1
+
+    async def send_board(self, content):
+        """
+        Send the rendered state of the game, either as a new message or by editing the last board message
+        """
+        if not self.EDIT_BOARD_IN_PLACE:
+            return await self.send(content)
+        if self._outbox is None:
+            return await self._show_board(content)
+        self._outbox.add_board(content)
+
+    def snapshot(self):
+        """
+        Return the game's state as a compact binary snapshot
+        """
+        writer = SnapshotWriter(self.get_game_short_name(), [player.id for player in self.players])
+        writer.u32(self._moves_handled)
+        writer.u32(self._moves_rejected)
+        writer.u64(self._game_id)
+        writer.u32(self._journal_seq)
+        self._save_state(writer)
+        return writer.getvalue()
+
+    def restore(self, data, get_player):
+        """
+        Replace this game's state, including its players, with that of a snapshot. `get_player` is called with each
+        player id in the snapshot and must return that player (or the bot's user). `setup` must not be called first.
+        Raises SnapshotError if the snapshot is unusable.
+        """
+        reader = SnapshotReader(data, self.get_game_short_name())
+        self.players = [get_player(player_id) for player_id in reader.player_ids]
+        self._moves_handled = reader.u32()
+        self._moves_rejected = reader.u32()
+        self._game_id = reader.u64()
+        self._journal_seq = reader.u32()
+        before = set(vars(self))
+        self._load_state(reader)
+        self._state_attributes = frozenset(vars(self).keys() - before - SHELL_ATTRIBUTES)
+        reader.finish()
+        # The old board message belongs to the previous process, the next show posts a new one
+        self._board_message = self._board_hash = None
+        self._last_active = time.monotonic()
+        Eviction.track(self)
+
+    def _get_step_lock(self):
+        """
+        The lock a setup or move holds while it runs, which the idle sweep also takes before touching the game
+        """
+        if self._step_lock is None:
+            self._step_lock = asyncio.Lock()
+        return self._step_lock
+
+    def __getattr__(self, name):
+        # Only reached for attributes that aren't set, which for an evicted game includes all of its state. Loading it
+        # here reads the store on the event loop; setup and move load it in an executor before they start instead.
+        if self.__dict__.get('_evicted'):
+            self._rehydrate()
+            return getattr(self, name)
+        raise AttributeError('{!r} object has no attribute {!r}'.format(type(self).__name__, name))
+
+    def _drop_state(self):
+        """
+        Forget the state setup created, once the game's snapshot is safely stored
+        """
+        for name in self._state_attributes:
+            if name in self.__dict__:
+                delattr(self, name)
+        self._evicted = True
+
+    def _rehydrate(self, data=None):
+        """
+        Load an evicted game back from its snapshot `data`, or from the store, keeping its board message so the board
+        is still edited in place
+        """
+        if data is None:
+            data = Eviction.take(self)
+        if data is None:
+            raise SnapshotError('Evicted game {:016x} is missing from the store'.format(self._game_id))
+        players = {player.id: player for player in self.players}
+        board_message, board_hash, last_active = self._board_message, self._board_hash, self._last_active
+        self._evicted = False
+        self.restore(data, players.__getitem__)
+        self._board_message, self._board_hash, self._last_active = board_message, board_hash, last_active
+        logger.debug('Loaded evicted game {:016x} back'.format(self._game_id))
+        if Metrics.is_enabled():
+            Metrics.for_game(self.get_game_name()).count('games_rehydrated')
+
+    async def _abandon(self):
+        await self.send(self.ABANDON_NOTICE)
+        await self.end_game()
+        if Metrics.is_enabled():
+            Metrics.for_game(self.get_game_name()).count('games_abandoned')
+
+    def _save_state(self, writer):
+        raise NotImplementedError('{} does not support snapshots'.format(self.get_game_name()))
+
+    def _load_state(self, reader):
+        raise NotImplementedError('{} does not support snapshots'.format(self.get_game_name()))
+
+    def _journal_params(self):
+        """
+        The setup options a replay needs, as small non-negative integers
+        """
+        return ()
+
+    @staticmethod
+    def replay(params, players, moves):
+        """
+        Rebuild a game of this type from `params` (as returned by `_journal_params`), the number of players and a list
+        of (turn index, value, text) moves, without Discord. Returns (state, winner index or None).
+        """
+        raise NotImplementedError
+
+    def _journal_move(self, player, value, text=None):
+        """
+        Record that the player at turn index `player` made the move `value` (or the word `text`)
+        """
+        self._journal_seq += 1
+        self._append_journal(Journal.move_records(self._game_id, self._journal_seq, player, value, text))
+
+    def _append_journal(self, records):
+        if not Journal.is_enabled():
+            return
+        if self._journal is None:
+            Journal.write(records)
+        else:
+            self._journal.extend(records)
+
+    def _write_journal(self, name, result):
+        records, self._journal = self._journal, None
+        if name == 'setup':
+            if not isinstance(result, SetupSuccess):
+                return
+            # The players are only final once setup has shuffled them, so the start records go in last but are
+            # written ahead of any moves the bot made during setup
+            records[:0] = Journal.start_records(self._game_id, self.get_game_short_name(), [player.id for player in self.players], self._journal_params())
+        Journal.write(records)
+
+    def _player_index(self, player):
+        """
+        Index of `player` in `players` for a snapshot, or 255 for nobody
+        """
+        return 255 if player is None else self.players.index(player)
+
+    def _player_at(self, index):
+        return None if index == 255 else self.players[index]
+
+    async def end_game(self):
+        self._game_ended()
+        await super().end_game()
+
+    @contextlib.contextmanager
+    def measure(self, histogram):
+        """
+        Time the body of the with statement into `histogram` of this game's metrics
+        """
+        if not Metrics.is_enabled():
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Metrics.for_game(self.get_game_name()).observe(histogram, time.perf_counter() - start)
+
+    def _record_step(self, name, elapsed, result):
+        if not Metrics.is_enabled():
+            return
+        metrics = Metrics.for_game(self.get_game_name())
+        metrics.observe('send_seconds', self._send_time)
+        if name == 'setup':
+            metrics.observe('setup_seconds', elapsed - self._send_time)
+            if isinstance(result, SetupSuccess):
+                metrics.count('games_started')
+            elif isinstance(result, SetupFailure):
+                metrics.count('setups_failed')
+        elif self._counting_move:
+            metrics.observe('move_seconds', elapsed - self._send_time)
+            metrics.count('moves')
+
+    def _game_ended(self):
+        Eviction.forget(self)
+        self._append_journal(Journal.end_records(self._game_id, self._journal_seq))
+        if Metrics.is_enabled():
+            metrics = Metrics.for_game(self.get_game_name())
+            metrics.count('games_ended')
+            metrics.observe('moves_per_game', self._moves_handled - self._moves_rejected)
+
+    async def _channel_send(self, content):
+        start = time.perf_counter()
+        try:
+            return await self.channel.send(content)
+        finally:
+            self._send_time += time.perf_counter() - start
+            if Metrics.is_enabled():
+                Metrics.for_game(self.get_game_name()).count('messages_sent')
+
+    async def _show_board(self, content):
+        if hash(content) == self._board_hash:
+            return
+        if self._board_message is not None:
+            start = time.perf_counter()
+            try:
+                await self._board_message.edit(content=content)
+                self._board_hash = hash(content)
+                if Metrics.is_enabled():
+                    Metrics.for_game(self.get_game_name()).count('board_edits')
+                return
+            except Exception:
+                logger.warning('Could not edit the board message, sending a new one', exc_info=True)
+            finally:
+                self._send_time += time.perf_counter() - start
+        self._board_message = await self._channel_send(content)
+        self._board_hash = hash(content)
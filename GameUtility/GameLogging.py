@@ -0,0 +1,91 @@
+"""
+One logging setup shared by every game module.
+
+Loggers from `get_logger` only put records on a queue; a single background QueueListener thread writes them to a
+rotating file in LOG_DIRECTORY. Nothing is opened or started until the first record is logged, so importing a game
+costs nothing, and a move never waits on disk I/O. Use `set_level` to change the level of every game logger at
+runtime.
+"""
+import atexit
+import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+LOG_DIRECTORY = '../logs'
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+FORMAT = '%(asctime)s::%(levelname)s::%(name)s::%(message)s'
+
+_queue = queue.SimpleQueue()
+_lock = threading.Lock()
+_listener = None
+_level = logging.DEBUG
+_loggers = []
+
+
+def _log_file_name():
+    return os.path.join(LOG_DIRECTORY, '{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
+
+
+def start():
+    """
+    Start the background writer. Called automatically by the first logged record.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        handler = logging.handlers.RotatingFileHandler(_log_file_name(), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, delay=True)
+        handler.setFormatter(logging.Formatter(FORMAT))
+        _listener = logging.handlers.QueueListener(_queue, handler, respect_handler_level=False)
+        _listener.start()
+        atexit.register(stop)
+
+
+def stop():
+    """
+    Write out everything still queued and stop the background writer
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        if _listener is None:
+            start()
+        super().enqueue(record)
+
+
+_handler = _LazyQueueHandler(_queue)
+
+
+def get_logger(name):
+    """
+    Return the logger for a game module, wired to the shared queue
+    """
+    logger = logging.getLogger(name)
+    if _handler not in logger.handlers:
+        logger.addHandler(_handler)
+        logger.setLevel(_level)
+        _loggers.append(logger)
+    return logger
+
+
+def set_level(level):
+    """
+    Change the level of every game logger, e.g. `set_level(logging.INFO)` to drop the per-move DEBUG lines
+    """
+    global _level
+    _level = level
+    for logger in _loggers:
+        logger.setLevel(level)
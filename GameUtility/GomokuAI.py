@@ -0,0 +1,249 @@
+import atexit
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import time
+
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+FIVE = 10000000
+OPEN_FOUR = 100000
+FOUR = 10000
+OPEN_THREE = 5000
+THREE = 300
+OPEN_TWO = 200
+TWO = 30
+
+_pool = None
+
+
+def get_pool():
+    """
+    The process pool bot searches run in, created the first time a bot needs it. Using processes rather than threads
+    lets concurrent bot games search on separate cores. Workers are spawned rather than forked, as by then the bot
+    already runs the logging and journal threads, which a forked child would inherit mid-write.
+    """
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
+        atexit.register(shutdown_pool)
+    return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the search workers, dropping searches that haven't started
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+@functools.lru_cache(maxsize=None)
+def line_score(pattern):
+    """
+    Score the shape a stone makes on one line. `pattern` is the line centred on that stone, 2 * run_length - 1 cells
+    long, written from the stone owner's point of view: 'x' own stone, 'o' opponent stone, '.' empty, '|' off the
+    board. There are only a few thousand distinct patterns, so every one is worked out once and then cached.
+    """
+    run_length = (len(pattern) + 1) // 2
+    center = run_length - 1
+
+    best = 0
+    for start in range(0, center + 1):
+        window = pattern[start:start + run_length]
+        if len(window) == run_length and 'o' not in window and '|' not in window:
+            best = max(best, window.count('x'))
+
+    def is_open(count):
+        for start in range(max(0, center - run_length + 1), center):
+            window = pattern[start:start + run_length + 1]
+            if len(window) == run_length + 1 and window[0] == '.' and window[-1] == '.' and 'o' not in window and '|' not in window and window.count('x') == count:
+                return True
+        return False
+
+    if best >= run_length:
+        return FIVE
+    elif best == run_length - 1:
+        return OPEN_FOUR if is_open(best) else FOUR
+    elif best == run_length - 2:
+        return OPEN_THREE if is_open(best) else THREE
+    elif best == run_length - 3:
+        return OPEN_TWO if is_open(best) else TWO
+    return best
+
+
+class CandidateSet:
+    """
+    The empty cells within `radius` of a stone. Those are the only moves worth considering, and the set is updated
+    from the stone that was just played instead of being rebuilt from the whole board.
+    """
+
+    __slots__ = ('size', 'radius', 'cells')
+
+    def __init__(self, size, radius=2):
+        self.size = size
+        self.radius = radius
+        self.cells = set()
+
+    @classmethod
+    def from_cells(cls, size, cells, radius=2):
+        """
+        The candidates of the board `cells`, a flat array of cell codes with 0 for empty
+        """
+        candidates = cls(size, radius)
+        for idx, code in enumerate(cells):
+            if code:
+                candidates.play(cells, idx)
+        return candidates
+
+    def play(self, cells, idx):
+        """
+        Update for a stone placed at `idx`. Returns what is needed to `unplay` it.
+        """
+        was_candidate = idx in self.cells
+        self.cells.discard(idx)
+        added = []
+        col, row = idx % self.size, idx // self.size
+        for r in range(max(0, row - self.radius), min(self.size, row + self.radius + 1)):
+            for c in range(max(0, col - self.radius), min(self.size, col + self.radius + 1)):
+                neighbour = r * self.size + c
+                if cells[neighbour] == 0 and neighbour not in self.cells:
+                    self.cells.add(neighbour)
+                    added.append(neighbour)
+        return was_candidate, added
+
+    def unplay(self, idx, undo):
+        was_candidate, added = undo
+        self.cells.difference_update(added)
+        if was_candidate:
+            self.cells.add(idx)
+
+
+class GomokuSearcher:
+    """
+    Picks moves for a two player Gomoku game on a flat `size * size` array of cell codes.
+
+    A move is chosen by, in order: completing our own run, blocking the opponent's, making an unstoppable four, a
+    threat-space search for a win by continuous fours, and finally the best attack + defense pattern score. Only
+    cells in the CandidateSet are ever considered.
+    """
+
+    def __init__(self, size, run_length, cells, candidates, me, them):
+        self.size = size
+        self.run_length = run_length
+        self.cells = bytearray(cells)
+        self.candidates = CandidateSet(size)
+        self.candidates.cells = set(candidates)
+        self.me = me
+        self.them = them
+        self._deadline = 0
+
+    def pattern(self, idx, direction, code):
+        """
+        The line through `idx` as seen by the owner of `code`, as if they had a stone on `idx`
+        """
+        size = self.size
+        dcol, drow = direction
+        col, row = idx % size, idx // size
+        chars = []
+        for i in range(1 - self.run_length, self.run_length):
+            c, r = col + i * dcol, row + i * drow
+            if i == 0:
+                chars.append('x')
+            elif not (0 <= c < size and 0 <= r < size):
+                chars.append('|')
+            else:
+                cell = self.cells[r * size + c]
+                chars.append('.' if cell == 0 else 'x' if cell == code else 'o')
+        return ''.join(chars)
+
+    def shapes(self, idx, code):
+        return [line_score(self.pattern(idx, direction, code)) for direction in DIRECTIONS]
+
+    def value(self, idx):
+        attack = self.shapes(idx, self.me)
+        defense = self.shapes(idx, self.them)
+        score = sum(attack) + sum(defense) * 0.8
+        # Two threats at once can't both be blocked
+        if sum(1 for shape in attack if shape >= OPEN_THREE) >= 2:
+            score += OPEN_FOUR
+        if sum(1 for shape in defense if shape >= OPEN_THREE) >= 2:
+            score += OPEN_FOUR * 0.8
+        return score
+
+    def five_points(self, code):
+        return [idx for idx in self.candidates.cells if FIVE in self.shapes(idx, code)]
+
+    def best_move(self, time_limit):
+        self._deadline = time.monotonic() + time_limit
+        if not self.candidates.cells:
+            return (self.size // 2) * self.size + self.size // 2
+
+        wins = self.five_points(self.me)
+        if wins:
+            return wins[0]
+        blocks = self.five_points(self.them)
+        if blocks:
+            return blocks[0]
+
+        ranked = sorted(self.candidates.cells, key=self.value, reverse=True)
+        for idx in ranked:
+            shapes = self.shapes(idx, self.me)
+            if OPEN_FOUR in shapes or shapes.count(FOUR) >= 2:
+                return idx
+
+        winning = self.threat_search(depth=8)
+        if winning is not None:
+            return winning
+        return ranked[0]
+
+    def threat_search(self, depth):
+        """
+        Look for a win by continuous fours: every four forces a single reply, so the tree stays narrow even though it
+        is searched several moves deep. Returns the first move of a winning sequence, or None.
+        """
+        if depth == 0 or time.monotonic() > self._deadline:
+            return None
+        for idx in list(self.candidates.cells):
+            shapes = self.shapes(idx, self.me)
+            if FIVE in shapes:
+                return idx
+            if FOUR not in shapes and OPEN_FOUR not in shapes:
+                continue
+            self.cells[idx] = self.me
+            undo = self.candidates.play(self.cells, idx)
+            replies = self.five_points(self.me)
+            result = None
+            if len(replies) > 1:
+                result = idx
+            elif len(replies) == 1 and FIVE not in self.shapes(replies[0], self.them) and FOUR not in self.shapes(replies[0], self.them):
+                reply = replies[0]
+                self.cells[reply] = self.them
+                reply_undo = self.candidates.play(self.cells, reply)
+                if self.threat_search(depth - 1) is not None:
+                    result = idx
+                self.candidates.unplay(reply, reply_undo)
+                self.cells[reply] = 0
+            self.candidates.unplay(idx, undo)
+            self.cells[idx] = 0
+            if result is not None:
+                return result
+        return None
+
+    def quick_move(self):
+        """
+        The best move by pattern score alone, for when there is no time left to search
+        """
+        if not self.candidates.cells:
+            return (self.size // 2) * self.size + self.size // 2
+        return max(self.candidates.cells, key=self.value)
+
+
+def search_move(size, run_length, cells, candidates, me, them, time_limit):
+    """
+    Process pool entry point: build a searcher from plain, picklable state and return the chosen cell index
+    """
+    return GomokuSearcher(size, run_length, cells, candidates, me, them).best_move(time_limit)
@@ -0,0 +1,96 @@
+"""
+Stand-ins for the Discord objects a game talks to, so games can be driven through their real `setup`, `move` and
+`show` coroutines without a bot connection. Used by Benchmark.py; also handy from a REPL:
+
+    game, channel = create_game(ConnectFour.GameObject, players=2)
+    await game.setup([])
+    await game.move([4], game.get_current_player())
+    print(channel.history[-1])
+"""
+import functools
+
+
+class HeadlessPlayer:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.mention = '<@{}>'.format(id)
+
+    def __repr__(self):
+        return 'HeadlessPlayer({!r}, {!r})'.format(self.id, self.name)
+
+
+class HeadlessBot:
+    def __init__(self):
+        self.user = HeadlessPlayer(0, 'droiddevic')
+
+
+class HeadlessMessage:
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        self.channel.edits += 1
+        self.content = content
+        if self.channel.history is not None:
+            self.channel.history.append(content)
+        return self
+
+
+class HeadlessChannel:
+    """
+    Counts sends and edits. With `keep_history` every message body is also kept in `history`.
+    """
+
+    def __init__(self, keep_history=True):
+        self.sends = 0
+        self.edits = 0
+        self.history = [] if keep_history else None
+
+    async def send(self, content=None, **kwargs):
+        self.sends += 1
+        if self.history is not None:
+            self.history.append(content)
+        return HeadlessMessage(self, content)
+
+
+@functools.lru_cache(maxsize=None)
+def headless_class(cls):
+    """
+    Subclass a GameObject so `bot`, `channel` and `players` are plain attributes and `end_game` only records that
+    the game ended (and lets GameBase record its metrics), independent of how GameParent.Game implements them.
+    """
+    class HeadlessGame(cls):
+        bot = None
+        channel = None
+        players = None
+        ended = False
+
+        def __init__(self, bot, channel, players):
+            self.bot = bot
+            self.channel = channel
+            self.players = players
+
+        async def end_game(self):
+            self.ended = True
+            game_ended = getattr(self, '_game_ended', None)
+            if game_ended is not None:
+                game_ended()
+
+    HeadlessGame.__name__ = HeadlessGame.__qualname__ = 'Headless' + cls.__module__.split('.')[-1]
+    return HeadlessGame
+
+
+def create_game(cls, players=2, keep_history=True):
+    """
+    Return a (game, channel) pair for the GameObject class `cls` with `players` headless players
+    """
+    channel = HeadlessChannel(keep_history)
+    game = headless_class(cls)(HeadlessBot(), channel, [HeadlessPlayer(i + 1, 'player{}'.format(i + 1)) for i in range(players)])
+    return game, channel
+
+
+def current_player(game):
+    get_current_player = getattr(game, 'get_current_player', None)
+    return get_current_player() if get_current_player is not None else game.players[0]
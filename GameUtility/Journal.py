@@ -0,0 +1,295 @@
+"""
+An append-only journal of every accepted move, and a replay engine that rebuilds games from it without Discord.
+
+The journal is a flat file of fixed-width 24 byte records, so it can be memory mapped and walked with
+struct.iter_unpack. Every record is (game id, aux, seq, player, kind, value):
+
+    START   player = number of players, value = the game's short name as up to 4 ASCII bytes
+    PLAYER  player = turn order index, aux = the player's id
+    PARAM   player = parameter index, value = the parameter (board size, seed, ...)
+    MOVE    seq = move number from 1, player = turn index of the mover, aux = time in microseconds, value = the move
+    TEXT    up to 12 more bytes of the move before it (aux then value), for moves that are words
+    END     seq = moves played, aux = time in microseconds
+
+The journal is off until `enable(path)` is called. GameBase then hands over the records of a whole `setup` or `move`
+at once, and a background thread appends them, so records of concurrent games interleave but never tear and a move
+never waits on the disk. If the file can't be written the records are dropped and a warning is logged; the games
+carry on regardless. Each game type defines `_journal_params` and a static `replay(params, players, moves)` that
+applies moves to a bare state as fast as possible.
+
+Replay from the command line with `python -m GameUtility.Journal [path] [game-id] [--upto N]`.
+"""
+import argparse
+import atexit
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+from GameUtility import Registry
+from GameUtility.GameLogging import get_logger
+
+logger = get_logger(__name__)
+
+JOURNAL_PATH = '../data/moves.jnl'
+RECORD = struct.Struct('<QQHBBI')
+START, PLAYER, PARAM, MOVE, TEXT, END = range(1, 7)
+TEXT_CHUNK = 12
+
+_lock = threading.Lock()
+_enabled = False
+_path = JOURNAL_PATH
+_queue = queue.SimpleQueue()
+_writer = None
+# Put on the queue to stop the writer
+_STOP = object()
+
+
+def enable(path=JOURNAL_PATH):
+    global _enabled, _path
+    close()
+    _enabled, _path = True, path
+
+
+def disable():
+    global _enabled
+    close()
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def now():
+    return time.time_ns() // 1000
+
+
+def write(records):
+    """
+    Queue packed records to be appended to the journal together, starting the writer on first use
+    """
+    global _writer
+    if not _enabled or not records:
+        return
+    if _writer is None:
+        with _lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_queued, args=(_path,), name='journal-writer', daemon=True)
+                _writer.start()
+                atexit.register(close)
+    _queue.put(b''.join(records))
+
+
+def _write_queued(path):
+    file = None
+    failing = False
+    while True:
+        chunks = [_queue.get()]
+        # Take everything else already waiting, to write it in one go
+        while True:
+            try:
+                chunks.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = any(chunk is _STOP for chunk in chunks)
+        flushed = [chunk for chunk in chunks if isinstance(chunk, threading.Event)]
+        data = b''.join(chunk for chunk in chunks if isinstance(chunk, bytes))
+        if data:
+            try:
+                if file is None:
+                    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                    file = open(path, 'ab')
+                file.write(data)
+                file.flush()
+                failing = False
+            except OSError:
+                # Only the first failure in a row is logged; the file is opened again for the next records
+                if not failing:
+                    logger.warning('Could not write to the move journal {}, dropping records'.format(path), exc_info=True)
+                failing = True
+                if file is not None:
+                    file.close()
+                    file = None
+        for event in flushed:
+            event.set()
+        if stop:
+            break
+    if file is not None:
+        file.close()
+
+
+def flush(timeout=None):
+    """
+    Wait until everything queued so far has been written
+    """
+    if _writer is not None:
+        done = threading.Event()
+        _queue.put(done)
+        done.wait(timeout)
+
+
+def close():
+    """
+    Write out everything queued and stop the writer
+    """
+    global _writer
+    with _lock:
+        if _writer is not None:
+            _queue.put(_STOP)
+            _writer.join()
+            _writer = None
+
+
+def start_records(game_id, short_name, player_ids, params):
+    records = [RECORD.pack(game_id, now(), 0, len(player_ids), START, int.from_bytes(short_name.encode('ascii')[:4].ljust(4, b'\0'), 'little'))]
+    records.extend(RECORD.pack(game_id, player_id, 0, index, PLAYER, 0) for index, player_id in enumerate(player_ids))
+    records.extend(RECORD.pack(game_id, 0, 0, index, PARAM, int(param)) for index, param in enumerate(params))
+    return records
+
+
+def move_records(game_id, seq, player, value, text=None):
+    """
+    Pack one move. A `text` move stores its UTF-8 length in the MOVE record and the bytes in TEXT records after it.
+    """
+    if text is None:
+        return [RECORD.pack(game_id, now(), seq, player, MOVE, value)]
+    data = text.encode('utf-8')
+    records = [RECORD.pack(game_id, now(), seq, player, MOVE, len(data))]
+    for start in range(0, len(data), TEXT_CHUNK):
+        chunk = data[start:start + TEXT_CHUNK].ljust(TEXT_CHUNK, b'\0')
+        records.append(RECORD.pack(game_id, int.from_bytes(chunk[:8], 'little'), seq, player, TEXT, int.from_bytes(chunk[8:], 'little')))
+    return records
+
+
+def end_records(game_id, seq):
+    return [RECORD.pack(game_id, now(), seq, 0, END, 0)]
+
+
+class JournalGame:
+    """
+    Everything the journal holds about one game. `moves` is a list of (turn index, value, text) in play order.
+    """
+
+    __slots__ = ('game_id', 'short_name', 'player_ids', 'params', 'moves', 'started', 'ended')
+
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.short_name = None
+        self.player_ids = []
+        self.params = []
+        self.moves = []
+        self.started = None
+        self.ended = None
+
+    def replay(self, upto=None):
+        """
+        Rebuild the game after its first `upto` moves (all of them by default). Returns (state, winner), where the
+        state is game specific (usually the board) and the winner is a turn order index, or None if there isn't one
+        or it can't be told from the moves alone.
+        """
+        cls = Registry.load(self.short_name)
+        moves = self.moves if upto is None else self.moves[:upto]
+        return cls.replay(self.params, len(self.player_ids), moves)
+
+
+class JournalReader:
+    """
+    A memory mapped, read-only view of a journal file
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        # A record torn by a crash mid-write is ignored
+        self._size = len(self._map) - len(self._map) % RECORD.size
+
+    def __len__(self):
+        return self._size // RECORD.size
+
+    def records(self):
+        return RECORD.iter_unpack(memoryview(self._map)[:self._size])
+
+    def games(self, game_id=None):
+        """
+        Group the journal into a JournalGame per game id, in order of first appearance. With `game_id` only that
+        game is collected.
+        """
+        games = {}
+        text = None
+        for record_game, aux, seq, player, kind, value in self.records():
+            if game_id is not None and record_game != game_id:
+                continue
+            if text is not None and kind != TEXT:
+                text.finish()
+                text = None
+            game = games.get(record_game)
+            if game is None:
+                game = games[record_game] = JournalGame(record_game)
+            if kind == MOVE:
+                game.moves.append((player, value, None))
+            elif kind == TEXT:
+                if text is None:
+                    text = _TextMove(game)
+                text.add(aux, value)
+            elif kind == START:
+                game.short_name = value.to_bytes(4, 'little').rstrip(b'\0').decode('ascii')
+                game.started = aux
+            elif kind == PLAYER:
+                game.player_ids.append(aux)
+            elif kind == PARAM:
+                game.params.append(value)
+            elif kind == END:
+                game.ended = aux
+        if text is not None:
+            text.finish()
+        return games
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+
+class _TextMove:
+    """
+    Collects the TEXT records following a MOVE and puts the decoded text into that move
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.chunks = []
+
+    def add(self, aux, value):
+        self.chunks.append(aux.to_bytes(8, 'little') + value.to_bytes(4, 'little'))
+
+    def finish(self):
+        player, length, _ = self.game.moves[-1]
+        self.game.moves[-1] = (player, length, b''.join(self.chunks)[:length].decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay games from a move journal')
+    parser.add_argument('path', nargs='?', default=JOURNAL_PATH, help='journal file')
+    parser.add_argument('game', nargs='?', type=lambda value: int(value, 0), help='game id to replay (default: list games)')
+    parser.add_argument('--upto', type=int, help='replay only the first UPTO moves')
+    options = parser.parse_args()
+
+    reader = JournalReader(options.path)
+    games = reader.games(options.game)
+    if options.game is None:
+        for game in games.values():
+            print('{:#018x}  {:<4}  {} players  {} moves  {}'.format(game.game_id, game.short_name, len(game.player_ids), len(game.moves), 'ended' if game.ended else 'running'))
+        return
+    if options.game not in games:
+        parser.error('no game {:#x} in {}'.format(options.game, options.path))
+    state, winner = games[options.game].replay(options.upto)
+    render = getattr(state, 'render', None) or getattr(state, 'parse', None)
+    print(render() if render is not None else state)
+    print('winner: {}'.format('none' if winner is None else winner))
+
+
+if __name__ == '__main__':
+    main()
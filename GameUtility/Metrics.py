@@ -0,0 +1,180 @@
+"""
+Per game type counters and histograms, fed by the hooks in GameBase. Everything lives in one process wide registry
+keyed by game name, so a shard can see which game type its time goes to:
+
+    from GameUtility import Metrics
+    Metrics.snapshot()['ConnectFour']['move_seconds']['p99']
+    print(Metrics.to_prometheus())
+
+Timings are wall clock seconds from time.perf_counter(). `move_seconds` and `setup_seconds` only cover the game's own
+logic; time spent awaiting the channel is recorded separately as `send_seconds`. Recording is cheap, but can be
+switched off entirely with `disable()`.
+"""
+import bisect
+
+# Upper bounds of the histogram buckets, in seconds and in moves
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MOVE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+COUNTERS = {
+    'games_started': 'Games whose setup succeeded',
+    'setups_failed': 'Setups rejected with a SetupFailure',
+    'games_ended': 'Games that reached end_game',
+    'moves': 'Moves handled, not counting hints and other commands that play nothing',
+    'rejected_moves': 'Move commands rejected as illegal or malformed',
+    'messages_sent': 'Messages sent to the channel',
+    'board_edits': 'Board messages edited in place',
+    'games_evicted': 'Idle games moved out of memory into the store',
+    'games_rehydrated': 'Evicted games loaded back from the store',
+    'games_abandoned': 'Games ended for being idle too long',
+}
+
+HISTOGRAMS = {
+    'setup_seconds': ('Time spent in setup, excluding channel calls', TIME_BUCKETS),
+    'move_seconds': ('Time spent handling a move, excluding channel calls', TIME_BUCKETS),
+    'send_seconds': ('Time spent awaiting the channel per setup or move', TIME_BUCKETS),
+    'show_seconds': ('Time spent rendering the board', TIME_BUCKETS),
+    'win_check_seconds': ('Time spent checking for a win', TIME_BUCKETS),
+    'moves_per_game': ('Moves handled per finished game', MOVE_BUCKETS),
+}
+
+PREFIX = 'droiddevic_game_'
+
+_enabled = True
+_registry = {}
+
+
+class Histogram:
+    """
+    Fixed bucket histogram. `counts[i]` is the number of observations no greater than `bounds[i]` and greater than
+    the bound before it; the last slot holds everything past the final bound.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Estimate the q'th quantile as the upper bound of the bucket it falls in
+        """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip(self.bounds + ('+Inf',), self.counts)),
+        }
+
+
+class GameMetrics:
+    """
+    The counters and histograms of one game type
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {name: Histogram(bounds) for name, (_, bounds) in HISTOGRAMS.items()}
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def as_dict(self):
+        result = dict(self.counters)
+        result.update((name, histogram.as_dict()) for name, histogram in self.histograms.items())
+        return result
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def for_game(name):
+    """
+    Return the GameMetrics of the game type `name`, creating it on first use
+    """
+    metrics = _registry.get(name)
+    if metrics is None:
+        metrics = _registry[name] = GameMetrics()
+    return metrics
+
+
+def reset():
+    _registry.clear()
+
+
+def snapshot():
+    """
+    Return every game type's metrics as plain dicts, keyed by game name
+    """
+    return {name: metrics.as_dict() for name, metrics in sorted(_registry.items())}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus():
+    """
+    Render every game type's metrics in the Prometheus text exposition format
+    """
+    games = sorted(_registry.items())
+    lines = []
+    for name, description in COUNTERS.items():
+        metric = PREFIX + name + '_total'
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} counter'.format(metric))
+        for game, metrics in games:
+            lines.append('{}{{game="{}"}} {}'.format(metric, _label(game), metrics.counters[name]))
+    for name, (description, bounds) in HISTOGRAMS.items():
+        metric = PREFIX + name
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} histogram'.format(metric))
+        for game, metrics in games:
+            histogram = metrics.histograms[name]
+            game = _label(game)
+            cumulative = 0
+            for bound, count in zip(bounds + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append('{}_bucket{{game="{}",le="{}"}} {}'.format(metric, game, bound, cumulative))
+            lines.append('{}_sum{{game="{}"}} {}'.format(metric, game, histogram.total))
+            lines.append('{}_count{{game="{}"}} {}'.format(metric, game, histogram.count))
+    return '\n'.join(lines) + '\n'
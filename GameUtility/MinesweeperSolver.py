@@ -0,0 +1,492 @@
+"""
+A logic-only Minesweeper solver, and a generator of boards it can solve from the first click without guessing.
+
+The solver plays the way a careful player does. It uncovers the first cell and then repeatedly applies:
+
+* single cell rules: a number whose covered neighbours are all mines, or that already touches all its mines, settles
+  every one of those neighbours;
+* pair rules: for two numbers sharing covered cells, if the mines one needs outside the other can only fit one way,
+  those cells are settled (this covers the subset rule, where one number's cells contain the other's);
+* the mine count: when the mines left are none, or exactly the covered cells left, every cell is settled.
+
+Each number's unsettled neighbours are kept as a bitset that is updated as cells are settled, so the pair rules are a
+handful of integer operations, and only numbers next to a newly settled cell are looked at again.
+
+`mine_probabilities` goes further for hints: what logic can't settle, it weighs by counting every consistent way to
+place the remaining mines.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+# Most solver work (board cells times boards solved) spent looking for a board that needs no guesses, about two
+# seconds on a dense 50x50 board. Counting work rather than time gives the same board for a seed on any machine.
+NO_GUESS_WORK = 120000
+# Densest boards, as mines per cell they may go on, worth looking for a no-guess layout on; denser ones almost
+# never have one
+NO_GUESS_DENSITY = 0.25
+
+# Components of the frontier already counted, keyed by their constraints, oldest first. Hints are worked out in
+# executor threads, so the cache is only touched under its lock.
+COMPONENT_CACHE_SIZE = 512
+_component_cache = {}
+_component_lock = threading.Lock()
+
+
+def _bit_count(bits):
+    return bin(bits).count('1')
+
+
+def _cells(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class LogicSolver:
+    """
+    Solves the board with mine counts `counts` (one per cell) and `mines` mines in total, given as its
+    `neighbours` table. `solve(first)` uncovers the first cell and reports whether logic alone clears the board.
+
+    With `reveal_safe` off the solver only marks the cells it proves safe instead of uncovering them, so it never
+    learns more than a player looking at the board would. That is how hints use it, after `load`ing what the player
+    has uncovered.
+    """
+
+    def __init__(self, neighbours, counts, mines, reveal_safe=True):
+        self.neighbours = neighbours
+        self.counts = counts
+        self.mines = mines
+        self.reveal_safe = reveal_safe
+        self.cells = len(neighbours)
+        self.revealed = bytearray(self.cells)
+        self.flagged = bytearray(self.cells)
+        self.safe = bytearray(self.cells)
+        self.revealed_count = 0
+        self.flagged_count = 0
+        self.safe_count = 0
+        # For every uncovered cell, its unsettled neighbours and how many of them are mines, kept up to date as
+        # cells are settled. `active` holds the uncovered cells that still have unsettled neighbours.
+        self.unknown = [0] * self.cells
+        self.needed = [0] * self.cells
+        self.active = set()
+        self._dirty = deque()
+
+    def _settle(self, cell, mine):
+        bit = ~(1 << cell)
+        for neighbour in self.neighbours[cell]:
+            if self.revealed[neighbour]:
+                unknown = self.unknown[neighbour] & bit
+                self.unknown[neighbour] = unknown
+                if mine:
+                    self.needed[neighbour] -= 1
+                if unknown:
+                    self._dirty.append(neighbour)
+                else:
+                    self.active.discard(neighbour)
+
+    def _uncover(self, cell):
+        self.revealed[cell] = 1
+        self.revealed_count += 1
+        unknown = 0
+        needed = self.counts[cell]
+        for neighbour in self.neighbours[cell]:
+            if self.flagged[neighbour]:
+                needed -= 1
+            elif not self.revealed[neighbour]:
+                unknown |= 1 << neighbour
+        self.unknown[cell] = unknown
+        self.needed[cell] = needed
+        if unknown:
+            self.active.add(cell)
+            self._dirty.append(cell)
+        self._settle(cell, False)
+
+    def load(self, revealed_bits):
+        """
+        Uncover every cell of the bitset `revealed_bits`, without flooding outwards from empty cells
+        """
+        for cell in _cells(revealed_bits):
+            self._uncover(cell)
+
+    def _mark_safe(self, cell):
+        if self.reveal_safe:
+            self._reveal(cell)
+        elif not (self.revealed[cell] or self.flagged[cell] or self.safe[cell]):
+            self.safe[cell] = 1
+            self.safe_count += 1
+            self._settle(cell, False)
+
+    def _reveal(self, start):
+        if self.revealed[start] or self.flagged[start]:
+            return
+        revealed, counts, neighbours = self.revealed, self.counts, self.neighbours
+        self._uncover(start)
+        queue = [start]
+        while queue:
+            cell = queue.pop()
+            if counts[cell]:
+                continue
+            for neighbour in neighbours[cell]:
+                if not revealed[neighbour] and not self.flagged[neighbour]:
+                    self._uncover(neighbour)
+                    queue.append(neighbour)
+
+    def _flag(self, cell):
+        if self.flagged[cell] or self.revealed[cell] or self.safe[cell]:
+            return
+        self.flagged[cell] = 1
+        self.flagged_count += 1
+        self._settle(cell, True)
+
+    def constraint(self, cell):
+        """
+        The unsettled neighbours of the uncovered cell `cell` as a bitset, and how many of them are mines
+        """
+        return self.unknown[cell], self.needed[cell]
+
+    def _single_cell_rules(self):
+        progress = False
+        while self._dirty:
+            cell = self._dirty.popleft()
+            unknown, needed = self.unknown[cell], self.needed[cell]
+            if not unknown:
+                continue
+            if needed == 0:
+                for neighbour in _cells(unknown):
+                    self._mark_safe(neighbour)
+                progress = True
+            elif needed == _bit_count(unknown):
+                for neighbour in _cells(unknown):
+                    self._flag(neighbour)
+                progress = True
+        return progress
+
+    def frontier(self):
+        """
+        Every uncovered number that still has unsettled neighbours, as {cell: (unknown bitset, mines needed)}
+        """
+        return {cell: (self.unknown[cell], self.needed[cell]) for cell in self.active}
+
+    def _pair_rules(self):
+        constraints = self.frontier()
+        mines = safe = 0
+        # Numbers sharing a covered cell are within two steps of each other. Everything found in one pass is sound
+        # however the rest of the pass went, so it is all applied at the end.
+        for cell, (unknown_a, needed_a) in constraints.items():
+            others = set()
+            for neighbour in _cells(unknown_a):
+                others.update(other for other in self.neighbours[neighbour] if other in constraints and other != cell)
+            for other in others:
+                unknown_b, needed_b = constraints[other]
+                only_a = unknown_a & ~unknown_b
+                only_b = unknown_b & ~unknown_a
+                if not only_b:
+                    continue
+                # B needs as many more mines than A as it has cells A doesn't cover
+                if needed_b - needed_a == _bit_count(only_b):
+                    mines |= only_b
+                    safe |= only_a
+                elif not only_a and needed_b == needed_a:
+                    safe |= only_b
+        for neighbour in _cells(mines):
+            self._flag(neighbour)
+        for neighbour in _cells(safe):
+            self._mark_safe(neighbour)
+        return bool(mines or safe)
+
+    def _mine_count_rule(self):
+        left = self.mines - self.flagged_count
+        covered = self.cells - self.revealed_count - self.flagged_count - self.safe_count
+        if not covered or (left and left != covered):
+            return False
+        for cell in self.unsettled():
+            if left:
+                self._flag(cell)
+            else:
+                self._mark_safe(cell)
+        return True
+
+    def deduce(self):
+        """
+        Apply the rules until none of them settles anything more. Returns True if every cell was settled.
+        """
+        while True:
+            self._single_cell_rules()
+            if self.revealed_count + self.safe_count + self.mines == self.cells:
+                return True
+            if not (self._pair_rules() or self._mine_count_rule()):
+                return False
+
+    def solve(self, first):
+        """
+        Uncover `first` and deduce as far as possible. Returns True if every cell was settled.
+        """
+        self._reveal(first)
+        return self.deduce()
+
+    def unsettled(self):
+        return [cell for cell in range(self.cells) if not (self.revealed[cell] or self.flagged[cell] or self.safe[cell])]
+
+
+def generate_no_guess(neighbours, mines, first, rng, attempts=40, relocations=60, work=NO_GUESS_WORK):
+    """
+    Return a mine bitset with `mines` mines, none on `first` or around it, that LogicSolver clears from `first`, or
+    None if none was found within `attempts` fresh boards of up to `relocations` fixes each, or within `work` cells'
+    worth of solving. Boards denser than NO_GUESS_DENSITY aren't tried at all.
+
+    A board the solver gets stuck on is fixed up rather than thrown away: a mine from the stuck frontier is moved to
+    a covered cell away from it, and the board is solved again. All choices come from `rng`, so a seed always gives
+    the same board.
+    """
+    cells = len(neighbours)
+    safe = {first, *neighbours[first]}
+    if mines > (cells - len(safe)) * NO_GUESS_DENSITY:
+        return None
+    free = [cell for cell in range(cells) if cell not in safe]
+    for _ in range(attempts):
+        mine_cells = set(rng.sample(free, mines))
+        counts = bytearray(cells)
+        for cell in mine_cells:
+            for neighbour in neighbours[cell]:
+                counts[neighbour] += 1
+        for _ in range(relocations):
+            if work < cells:
+                return None
+            work -= cells
+            solver = LogicSolver(neighbours, counts, mines)
+            if solver.solve(first):
+                return sum(1 << cell for cell in mine_cells)
+            unsettled = solver.unsettled()
+            stuck = [cell for cell in unsettled if cell in mine_cells and any(solver.revealed[neighbour] for neighbour in neighbours[cell])]
+            away = [cell for cell in unsettled if cell not in mine_cells and cell not in safe and not any(solver.revealed[neighbour] for neighbour in neighbours[cell])]
+            if not stuck or not away:
+                break
+            source, target = rng.choice(stuck), rng.choice(away)
+            mine_cells.remove(source)
+            mine_cells.add(target)
+            for neighbour in neighbours[source]:
+                counts[neighbour] -= 1
+            for neighbour in neighbours[target]:
+                counts[neighbour] += 1
+    return None
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _components(frontier):
+    """
+    Split the frontier constraints into groups that share no covered cells, as lists of (bitset, mines needed)
+    """
+    groups = []
+    for constraint in frontier.values():
+        mask = constraint[0]
+        merged = [constraint]
+        for group in [group for group in groups if group[0] & mask]:
+            groups.remove(group)
+            mask |= group[0]
+            merged.extend(group[1])
+        groups.append((mask, merged))
+    return groups
+
+
+def _placement_order(constraints):
+    """
+    Order constraints so each one shares as many cells as possible with those before it, which prunes early
+    """
+    left = sorted(set(constraints))
+    order = [left.pop(0)]
+    seen = order[0][0]
+    while left:
+        best = max(range(len(left)), key=lambda index: _bit_count(left[index][0] & seen))
+        order.append(left.pop(best))
+        seen |= order[-1][0]
+    return tuple(order)
+
+
+def _spread(classes, sizes, mines):
+    """
+    Every way to put `mines` mines into the classes of cells `classes`, as (mines per class, number of placements)
+    """
+    if not classes:
+        if not mines:
+            yield (), 1
+        return
+    size, rest = sizes[classes[0]], classes[1:]
+    room = sum(sizes[other] for other in rest)
+    for here in range(max(0, mines - room), min(size, mines) + 1):
+        ways = math.comb(size, here)
+        for spread, count in _spread(rest, sizes, mines - here):
+            yield (here,) + spread, ways * count
+
+
+def _count_placements(order, deadline):
+    """
+    Count every placement of mines satisfying the constraints in `order`. Cells covered by exactly the same
+    constraints are interchangeable, so they are grouped into classes and only the number of mines in each class is
+    decided. Returns (cells of each class, {mines used: [placements, [mines in each class summed over placements]]}).
+    """
+    members = {}
+    for index, (mask, _) in enumerate(order):
+        for cell in _cells(mask):
+            members.setdefault(cell, []).append(index)
+    groups = {}
+    for cell, indices in members.items():
+        groups.setdefault(tuple(indices), []).append(cell)
+    cells, memberships = list(groups.values()), list(groups)
+    sizes = [len(group) for group in cells]
+    # The classes decided at each constraint (those it is the first to cover), and how many cells each constraint
+    # still has undecided once that constraint is done
+    decided = [[] for _ in order]
+    for group, indices in enumerate(memberships):
+        decided[indices[0]].append(group)
+    room = [[0] * len(order) for _ in order]
+    for group, indices in enumerate(memberships):
+        for step in range(indices[0]):
+            for index in indices:
+                room[step][index] += sizes[group]
+    memo = {}
+    empty = [0] * len(cells)
+
+    def count(index, placed):
+        # `placed` holds the mines already in each constraint from `index` on
+        if index == len(order):
+            return {0: [1, empty]}
+        key = (index, placed)
+        result = memo.get(key)
+        if result is not None:
+            return result
+        if time.perf_counter() > deadline:
+            raise _OutOfTime
+        result = {}
+        groups = decided[index]
+        for spread, ways in _spread(groups, sizes, order[index][1] - placed[0]):
+            after = list(placed[1:])
+            for group, mines in zip(groups, spread):
+                for other in memberships[group][1:]:
+                    after[other - index - 1] += mines
+            if any(mines > order[other][1] or mines + room[index][other] < order[other][1] for other, mines in enumerate(after, index + 1)):
+                continue
+            used = sum(spread)
+            for rest, (placements, tallies) in count(index + 1, tuple(after)).items():
+                entry = result.get(used + rest)
+                if entry is None:
+                    entry = result[used + rest] = [0, [0] * len(cells)]
+                entry[0] += ways * placements
+                totals = entry[1]
+                for group, tally in enumerate(tallies):
+                    if tally:
+                        totals[group] += ways * tally
+                for group, mines in zip(groups, spread):
+                    totals[group] += ways * placements * mines
+        memo[key] = result
+        return result
+
+    return cells, count(0, (0,) * len(order))
+
+
+def _component_placements(constraints, deadline):
+    order = _placement_order(constraints)
+    with _component_lock:
+        result = _component_cache.pop(order, None)
+        if result is not None:
+            _component_cache[order] = result
+            return result
+    # Counted outside the lock, so one big component doesn't hold up hints in other games
+    result = _count_placements(order, deadline)
+    with _component_lock:
+        _component_cache.pop(order, None)
+        while len(_component_cache) >= COMPONENT_CACHE_SIZE:
+            del _component_cache[next(iter(_component_cache))]
+        _component_cache[order] = result
+    return result
+
+
+def _multiply(left, right):
+    product = {}
+    for left_mines, left_count in left.items():
+        for right_mines, right_count in right.items():
+            product[left_mines + right_mines] = product.get(left_mines + right_mines, 0) + left_count * right_count
+    return product
+
+
+def mine_probabilities(neighbours, counts, revealed_bits, mines, time_limit=0.5, max_component=120):
+    """
+    The chance of a mine under every covered cell, given the uncovered cells `revealed_bits`, their `counts` and the
+    `mines` on the board. Returns ({cell: probability}, exact).
+
+    Logic settles what it can first. The rest of the frontier is split into components that share no numbers, and
+    every placement of mines in each component is counted by how many mines it uses. The components are then
+    weighed together by the ways the mines left over can lie in the cells away from the frontier. A component of more
+    than `max_component` cells, or one still being counted after `time_limit` seconds, is treated as if it were away
+    from the frontier, and `exact` is then False.
+    """
+    deadline = time.perf_counter() + time_limit
+    solver = LogicSolver(neighbours, counts, mines, reveal_safe=False)
+    solver.load(revealed_bits)
+    solver.deduce()
+    probabilities = {}
+    for cell in range(solver.cells):
+        if solver.flagged[cell]:
+            probabilities[cell] = 1.0
+        elif solver.safe[cell]:
+            probabilities[cell] = 0.0
+    unsettled = solver.unsettled()
+    if not unsettled:
+        return probabilities, True
+
+    exact = True
+    components = []
+    for mask, constraints in _components(solver.frontier()):
+        # Components of the frontier share no cells, so each is counted alone
+        if _bit_count(mask) > max_component:
+            exact = False
+            continue
+        try:
+            placements = _component_placements(constraints, deadline)
+        except _OutOfTime:
+            exact = False
+            continue
+        components.append((mask,) + placements)
+    counted = 0
+    for mask, _, _ in components:
+        counted |= mask
+    interior = [cell for cell in unsettled if not counted >> cell & 1]
+    left = mines - solver.flagged_count
+
+    def ways(used):
+        # Placements of the mines not in the components over the interior cells
+        return math.comb(len(interior), left - used) if 0 <= left - used <= len(interior) else 0
+
+    # products[i] is the distribution of mines over every component but the i'th
+    distributions = [{used: entry[0] for used, entry in placements.items()} for _, _, placements in components]
+    prefix = [{0: 1}]
+    for distribution in distributions:
+        prefix.append(_multiply(prefix[-1], distribution))
+    suffix = [{0: 1}]
+    for distribution in reversed(distributions):
+        suffix.append(_multiply(suffix[-1], distribution))
+    suffix.reverse()
+    total = sum(count * ways(used) for used, count in prefix[-1].items())
+    if not total:
+        # The board contradicts itself, which only a broken caller can cause; fall back to an even spread
+        for cell in unsettled:
+            probabilities[cell] = left / len(unsettled)
+        return probabilities, False
+
+    for index, (_, classes, placements) in enumerate(components):
+        others = _multiply(prefix[index], suffix[index + 1])
+        weights = {used: sum(count * ways(used + other) for other, count in others.items()) for used in placements}
+        for group, cells in enumerate(classes):
+            probability = sum(weights[used] * entry[1][group] for used, entry in placements.items()) / total / len(cells)
+            for cell in cells:
+                probabilities[cell] = probability
+    if interior:
+        expected = sum(count * ways(used) * (left - used) for used, count in prefix[-1].items())
+        for cell in interior:
+            probabilities[cell] = expected / total / len(interior)
+    return probabilities, exact
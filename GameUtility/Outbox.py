@@ -0,0 +1,82 @@
+MESSAGE_LIMIT = 2000
+
+# Marks where in the outbox the board goes; see Outbox.add_board
+BOARD = object()
+
+
+class Outbox:
+    """
+    Collects the messages a game produces during one step and sends them together. Consecutive messages are joined
+    with newlines into as few sends as possible, each kept under Discord's character limit.
+    """
+
+    __slots__ = ('limit', 'messages', 'board')
+
+    def __init__(self, limit=MESSAGE_LIMIT):
+        self.limit = limit
+        self.messages = []
+        self.board = None
+
+    def add(self, content):
+        self.messages.append(str(content))
+
+    def add_board(self, content):
+        """
+        Queue a board that is kept in a message of its own. Only the latest board of a step is worth showing, so it
+        replaces any board queued earlier.
+        """
+        if self.board is not None:
+            self.messages.remove(BOARD)
+        self.messages.append(BOARD)
+        self.board = str(content)
+
+    def _split(self, content):
+        """
+        Break one oversized message into pieces under the limit, preferring to cut at line breaks
+        """
+        pieces = []
+        while len(content) > self.limit:
+            cut = content.rfind('\n', 0, self.limit)
+            if cut <= 0:
+                cut = self.limit
+            pieces.append(content[:cut])
+            content = content[cut:].lstrip('\n')
+        pieces.append(content)
+        return pieces
+
+    def pack(self):
+        """
+        Return the list of message bodies the queued messages are sent as, with BOARD where the board goes
+        """
+        packed = []
+        current = None
+        for message in self.messages:
+            if message is BOARD:
+                if current is not None:
+                    packed.append(current)
+                    current = None
+                packed.append(BOARD)
+                continue
+            for piece in self._split(message):
+                if current is not None and len(current) + 1 + len(piece) <= self.limit:
+                    current += '\n' + piece
+                else:
+                    if current is not None:
+                        packed.append(current)
+                    current = piece
+        if current is not None:
+            packed.append(current)
+        return packed
+
+    async def flush(self, send, show_board=None):
+        """
+        Send everything queued with the `send` coroutine function and empty the outbox. The board, if any, is handed to the `show_board`
+        coroutine function instead.
+        """
+        bodies = self.pack()
+        board, self.messages, self.board = self.board, [], None
+        for body in bodies:
+            if body is BOARD:
+                await show_board(board)
+            else:
+                await send(body)
@@ -0,0 +1,162 @@
+"""
+Finds the game modules in Games and knows their names and rules without importing them.
+
+Each module's static metadata (`get_game_name`, `get_game_short_name`, `how_to_play`) is read from its source with
+`ast` and kept in a small JSON manifest at MANIFEST_PATH, keyed by file and checked against the file's size and
+modification time. Listing games or showing `help` only reads the manifest; a module is imported the first time a
+game of that type is started:
+
+    from GameUtility import Registry
+    for info in Registry.games():
+        print(info.short_name, info.name)
+    game_class = Registry.load('C4')
+
+Games whose metadata isn't plain string literals are imported once to read it, and the result is cached like any
+other.
+"""
+import ast
+import importlib
+import json
+import os
+import threading
+from collections import namedtuple
+
+GAMES_PACKAGE = 'Games'
+GAMES_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), GAMES_PACKAGE)
+MANIFEST_PATH = '../data/games.json'
+MANIFEST_VERSION = 1
+METADATA = ('get_game_name', 'get_game_short_name', 'how_to_play')
+
+GameInfo = namedtuple('GameInfo', ('module', 'name', 'short_name', 'how_to_play'))
+
+_lock = threading.Lock()
+_games = None
+_classes = {}
+
+
+def _literal_metadata(path):
+    """
+    Read the metadata of the module at `path` from its GameObject's static methods, or None if any of them is more
+    than `return <string>`
+    """
+    with open(path, 'rb') as file:
+        tree = ast.parse(file.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == 'GameObject':
+            found = {}
+            for method in node.body:
+                if isinstance(method, ast.FunctionDef) and method.name in METADATA:
+                    body = [statement for statement in method.body if not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant))]
+                    if len(body) != 1 or not isinstance(body[0], ast.Return) or not isinstance(body[0].value, ast.Constant) or not isinstance(body[0].value.value, str):
+                        return None
+                    found[method.name] = body[0].value.value
+            return [found[name] for name in METADATA] if len(found) == len(METADATA) else None
+    return None
+
+
+def _imported_metadata(module):
+    cls = load_module(module)
+    return [getattr(cls, name)() for name in METADATA]
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('modules', {})
+
+
+def _write_manifest(path, modules):
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'version': MANIFEST_VERSION, 'modules': modules}, file, indent=1, sort_keys=True)
+        os.replace(temporary, path)
+    except OSError:
+        # A read-only deployment just rebuilds the manifest in memory on every start
+        pass
+
+
+def scan(directory=GAMES_DIRECTORY, manifest_path=MANIFEST_PATH):
+    """
+    Find every game module in `directory`, reusing the manifest entries of files that haven't changed, and save the
+    manifest if anything had. Returns the GameInfo of each game, by module name.
+    """
+    cached = _read_manifest(manifest_path)
+    modules = {}
+    for file_name in sorted(os.listdir(directory)):
+        module, extension = os.path.splitext(file_name)
+        if extension != '.py' or module.startswith('_'):
+            continue
+        stat = os.stat(os.path.join(directory, file_name))
+        entry = cached.get(module)
+        if entry is None or entry.get('size') != stat.st_size or entry.get('mtime') != stat.st_mtime_ns:
+            metadata = _literal_metadata(os.path.join(directory, file_name)) or _imported_metadata(module)
+            entry = dict(zip(METADATA, metadata), size=stat.st_size, mtime=stat.st_mtime_ns)
+        modules[module] = entry
+    if modules != cached:
+        _write_manifest(manifest_path, modules)
+    return {module: GameInfo(module, entry['get_game_name'], entry['get_game_short_name'], entry['how_to_play']) for module, entry in modules.items()}
+
+
+def games():
+    """
+    The GameInfo of every game, scanning the Games directory on first use
+    """
+    global _games
+    with _lock:
+        if _games is None:
+            _games = scan()
+        return list(_games.values())
+
+
+def refresh():
+    """
+    Forget what is known about the games, so the next lookup scans again (after adding a game, say)
+    """
+    global _games
+    with _lock:
+        _games = None
+
+
+def find(name):
+    """
+    The GameInfo of the game called `name`, which may be its short name, full name or module name in any case, or
+    None if there is no such game
+    """
+    name = name.lower()
+    for info in games():
+        if name in (info.short_name.lower(), info.name.lower(), info.module.lower()):
+            return info
+    return None
+
+
+def load_module(module):
+    """
+    Import the game module `module` if it isn't yet, and return its GameObject class
+    """
+    cls = _classes.get(module)
+    if cls is None:
+        cls = _classes[module] = importlib.import_module(GAMES_PACKAGE + '.' + module).GameObject
+    return cls
+
+
+def load(name):
+    """
+    The GameObject class of the game called `name` (as for `find`), importing its module on first use. Raises
+    KeyError if there is no such game.
+    """
+    info = find(name)
+    if info is None:
+        raise KeyError('No game called {}'.format(name))
+    return load_module(info.module)
+
+
+def is_loaded(name):
+    info = find(name)
+    return info is not None and info.module in _classes
@@ -0,0 +1,140 @@
+"""
+The compact binary format games are snapshotted in, so a running game survives a restart or can be handed to another
+worker without replaying its history.
+
+A snapshot is a small header (magic, format version, the game's short name, the ids of its players in turn order)
+followed by whatever the game writes in its `_save_state`. Every field is little endian and fixed width, strings and
+byte strings are length prefixed, and boards are stored as their raw cell codes. A ConnectFour game is around 150
+bytes, so taking one after every move is cheap.
+"""
+import struct
+
+from GameUtility.Board import GridBoard
+
+MAGIC = b'DDGS'
+VERSION = 1
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a snapshot is corrupt, truncated or belongs to another game
+    """
+
+
+class SnapshotWriter:
+    def __init__(self, game_name, player_ids):
+        self._parts = [MAGIC, struct.pack('<B', VERSION)]
+        self.str(game_name)
+        self.u8(len(player_ids))
+        for player_id in player_ids:
+            self.u64(player_id)
+
+    def _pack(self, fmt, value):
+        self._parts.append(struct.pack(fmt, value))
+
+    def u8(self, value):
+        self._pack('<B', value)
+
+    def u16(self, value):
+        self._pack('<H', value)
+
+    def u32(self, value):
+        self._pack('<I', value)
+
+    def u64(self, value):
+        self._pack('<Q', value)
+
+    def bool(self, value):
+        self._pack('<?', value)
+
+    def bytes(self, value):
+        self.u32(len(value))
+        self._parts.append(bytes(value))
+
+    def str(self, value):
+        self.bytes(value.encode('utf-8'))
+
+    def str_list(self, values):
+        self.u16(len(values))
+        for value in values:
+            self.str(value)
+
+    def board(self, board):
+        """
+        Write a GridBoard: its size, its token table and its cell codes
+        """
+        self.u16(board.width)
+        self.u16(board.height)
+        self.str_list(board.tokens)
+        self.bytes(board.cells)
+
+    def getvalue(self):
+        return b''.join(self._parts)
+
+
+class SnapshotReader:
+    """
+    Reads back what a SnapshotWriter wrote. The header is checked against `game_name` on construction and the
+    player ids are left in `player_ids`.
+    """
+
+    def __init__(self, data, game_name):
+        self._data = memoryview(data)
+        self._offset = 0
+        if bytes(self._take(len(MAGIC))) != MAGIC:
+            raise SnapshotError('Not a game snapshot')
+        version = self.u8()
+        if version != VERSION:
+            raise SnapshotError('Unsupported snapshot version {}'.format(version))
+        name = self.str()
+        if name != game_name:
+            raise SnapshotError('Snapshot is of a {} game, not {}'.format(name, game_name))
+        self.player_ids = [self.u64() for _ in range(self.u8())]
+
+    def _take(self, size):
+        end = self._offset + size
+        if end > len(self._data):
+            raise SnapshotError('Snapshot is truncated')
+        chunk = self._data[self._offset:end]
+        self._offset = end
+        return chunk
+
+    def _unpack(self, fmt):
+        return struct.unpack(fmt, self._take(struct.calcsize(fmt)))[0]
+
+    def u8(self):
+        return self._unpack('<B')
+
+    def u16(self):
+        return self._unpack('<H')
+
+    def u32(self):
+        return self._unpack('<I')
+
+    def u64(self):
+        return self._unpack('<Q')
+
+    def bool(self):
+        return self._unpack('<?')
+
+    def bytes(self):
+        return bytes(self._take(self.u32()))
+
+    def str(self):
+        return self.bytes().decode('utf-8')
+
+    def str_list(self):
+        return [self.str() for _ in range(self.u16())]
+
+    def board(self):
+        width, height = self.u16(), self.u16()
+        board = GridBoard(width, height, self.str_list())
+        cells = self.bytes()
+        if len(cells) != width * height or max(cells, default=0) >= len(board.tokens):
+            raise SnapshotError('Snapshot board is inconsistent')
+        board.cells[:] = cells
+        return board
+
+    def finish(self):
+        if self._offset != len(self._data):
+            raise SnapshotError('Snapshot has {} trailing bytes'.format(len(self._data) - self._offset))
@@ -0,0 +1,104 @@
+"""
+Perfect play for TicTacToe from a precomputed table.
+
+Every reachable position is solved once per process and its best move stored under the position's canonical form,
+the smallest of its 8 rotations and reflections, so the ~5,500 reachable positions collapse to under 800 entries.
+Cells are 0 (empty), 1 (first player) and 2 (second player), row by row, and a position is packed into a base-3
+integer, so the table itself is a flat bytearray and answering a move is one lookup plus a symmetry mapping.
+"""
+
+NO_MOVE = 255
+
+# Each symmetry is a permutation: the transformed board's cell i is the original board's cell SYMMETRIES[s][i]
+_ROTATE = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+_MIRROR = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+_LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6))
+
+
+def _build_symmetries():
+    symmetries = []
+    perm = tuple(range(9))
+    for _ in range(4):
+        symmetries.append(perm)
+        symmetries.append(tuple(perm[i] for i in _MIRROR))
+        perm = tuple(perm[i] for i in _ROTATE)
+    return tuple(symmetries)
+
+
+SYMMETRIES = _build_symmetries()
+
+_table = None
+
+
+def _pack(cells):
+    code = 0
+    for cell in cells:
+        code = code * 3 + cell
+    return code
+
+
+def canonical(cells):
+    """
+    Return (packed canonical position, permutation that produced it)
+    """
+    return min((_pack([cells[i] for i in perm]), perm) for perm in SYMMETRIES)
+
+
+def winner(cells):
+    for a, b, c in _LINES:
+        if cells[a] != 0 and cells[a] == cells[b] == cells[c]:
+            return cells[a]
+    return 0
+
+
+def _solve(cells, player, table, scores):
+    """
+    Fill in `table` for this position and everything reachable from it. Returns the score for `player`, who is to
+    move: positive for a win (sooner is higher), negative for a loss, 0 for a draw.
+    """
+    code, _ = canonical(cells)
+    if code in scores:
+        return scores[code]
+    best_score, best_move = None, NO_MOVE
+    for idx in range(9):
+        if cells[idx] != 0:
+            continue
+        cells[idx] = player
+        if winner(cells):
+            score = 1 + cells.count(0)
+        elif 0 not in cells:
+            score = 0
+        else:
+            score = -_solve(cells, 3 - player, table, scores)
+        cells[idx] = 0
+        if best_score is None or score > best_score:
+            best_score, best_move = score, idx
+    # Store the move in canonical orientation, cells[perm[i]] is canonical cell i
+    _, perm = canonical(cells)
+    table[code] = perm.index(best_move)
+    scores[code] = best_score
+    return best_score
+
+
+def get_table():
+    """
+    The packed table, built the first time it is asked for
+    """
+    global _table
+    if _table is None:
+        table = bytearray([NO_MOVE]) * (3 ** 9)
+        _solve([0] * 9, 1, table, {})
+        _table = bytes(table)
+    return _table
+
+
+def best_move(cells):
+    """
+    Return the index (row * 3 + col) of the best move for whoever is to move on `cells`, or None if the game is over
+    """
+    cells = list(cells)
+    if winner(cells) or 0 not in cells:
+        return None
+    code, perm = canonical(cells)
+    move = get_table()[code]
+    return perm[move]
@@ -0,0 +1,25 @@
+# Horizontal, vertical, descending diagonal and ascending diagonal, as (col, row) steps
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def find_winning_line(board, col, row, run_length):
+    """
+    Look for `run_length` matching cells in a row on a GridBoard, passing through the cell at (col, row). Only the
+    four lines through that cell are walked, and never further than `run_length - 1` cells in either direction, so
+    checking the last move costs O(run_length) no matter how big the board is.
+
+    Returns the list of (col, row) cells making up the run, or None if the last move did not win.
+    """
+    code = board.get(col, row)
+    if code == board.EMPTY:
+        return None
+    for dcol, drow in DIRECTIONS:
+        line = [(col, row)]
+        for sign in (1, -1):
+            c, r = col + sign * dcol, row + sign * drow
+            while len(line) < run_length and board.is_valid(c, r) and board.get(c, r) == code:
+                line.append((c, r))
+                c, r = c + sign * dcol, r + sign * drow
+        if len(line) >= run_length:
+            return line
+    return None
@@ -0,0 +1,171 @@
+"""
+The WordPlay dictionary, built once per process and shared by every game.
+
+The index is either an in-memory frozenset made from GenericUtility.Language, or a precompiled file that is memory
+mapped and binary searched, so the words are shared by every process on the machine through the page cache. Build
+the file with `python -m GameUtility.WordIndex [path]`; if it exists at INDEX_PATH it is used automatically.
+
+`get_graph()` adds a one-edit neighbour index on top of the words, for hints and for spotting dead ends. The
+neighbour index lives in process memory even when the words are packed, about 9 MB for 100k words.
+
+Packed file layout: b'WPIX', the word count as a uint32, count + 1 uint32 offsets (native byte order) into the data,
+then the UTF-8 words sorted bytewise and concatenated.
+"""
+import array
+import mmap
+import os
+import struct
+import sys
+import threading
+
+INDEX_PATH = '../data/wordplay.idx'
+MAGIC = b'WPIX'
+_HEADER = struct.Struct('<4sI')
+
+_lock = threading.Lock()
+_index = None
+_graph = None
+
+
+def load_words():
+    """
+    Read and normalise the word list from GenericUtility.Language
+    """
+    from GenericUtility import Language
+    return frozenset(word for word in (line.strip().lower() for line in Language.dictionary.split('\n')) if word)
+
+
+class PackedWordIndex:
+    """
+    A read-only, memory mapped view of a packed word file supporting `in`, `len` and iteration
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a packed word index'.format(path))
+        self._count = count
+        offsets_end = _HEADER.size + 4 * (count + 1)
+        self._offsets = memoryview(self._map)[_HEADER.size:offsets_end].cast('I')
+        self._data = offsets_end
+
+    def _word_bytes(self, i):
+        return self._map[self._data + self._offsets[i]:self._data + self._offsets[i + 1]]
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._word_bytes(i).decode('utf-8')
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        target = word.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._word_bytes(mid) < target:
+                low = mid + 1
+            else:
+                high = mid
+        return low < self._count and self._word_bytes(low) == target
+
+
+def write_packed_index(words, path):
+    encoded = sorted(word.encode('utf-8') for word in words)
+    offsets = array.array('I', [0])
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, len(encoded)))
+        file.write(offsets.tobytes())
+        for word in encoded:
+            file.write(word)
+
+
+def get_index():
+    """
+    Return the shared word index, building (or mapping) it the first time any game asks for it
+    """
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = PackedWordIndex(INDEX_PATH) if os.path.exists(INDEX_PATH) else load_words()
+    return _index
+
+
+def _deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _one_substitution(word1, word2):
+    return sum(1 for a, b in zip(word1, word2) if a != b) == 1
+
+
+class WordGraph:
+    """
+    Finds every word one play away from a given word without scanning the dictionary.
+
+    Anagrams share a sorted-letter signature. A word one letter longer or shorter shows up as a deletion variant of
+    the other, and two words one substitution apart share a deletion variant. So the neighbours of a word are a few
+    dictionary lookups per letter instead of a pass over every word.
+    """
+
+    def __init__(self, words):
+        # Building looks up every deletion variant, which is a binary search of the file for a packed index, so the
+        # words are read into a set for the build only. Lookups afterwards go to `words` itself.
+        members = words if isinstance(words, (set, frozenset)) else frozenset(words)
+        anagrams = {}
+        deletions = {}
+        for word in members:
+            anagrams.setdefault(''.join(sorted(word)), []).append(word)
+            for variant in _deletions(word):
+                deletions.setdefault(variant, []).append(word)
+        self.words = words
+        # A signature with a single word has no anagrams to offer, and neither does a deletion variant of a single
+        # word unless the variant is a word itself, so only the rest are kept. That is most of the variants.
+        self.anagrams = {signature: tuple(group) for signature, group in anagrams.items() if len(group) > 1}
+        self.deletions = {variant: tuple(group) for variant, group in deletions.items() if len(group) > 1 or variant in members}
+
+    def neighbours(self, word):
+        """
+        Return the set of dictionary words that are a rearrangement, insertion, removal or substitution of `word`
+        """
+        found = set(self.anagrams.get(''.join(sorted(word)), ()))
+        # Insertions: words that become `word` when one of their letters is removed
+        found.update(self.deletions.get(word, ()))
+        for variant in _deletions(word):
+            # Removals
+            if variant in self.words:
+                found.add(variant)
+            # Substitutions
+            for other in self.deletions.get(variant, ()):
+                if len(other) == len(word) and _one_substitution(word, other):
+                    found.add(other)
+        found.discard(word)
+        return found
+
+
+def get_graph():
+    """
+    Return the shared neighbour index, building it the first time it is asked for. Building takes a while on a
+    full dictionary, so call this from an executor.
+    """
+    global _graph
+    if _graph is None:
+        words = get_index()
+        with _lock:
+            if _graph is None:
+                _graph = WordGraph(words)
+    return _graph
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else INDEX_PATH
+    write_packed_index(load_words(), path)
+    print('Wrote {} words to {}'.format(len(PackedWordIndex(path)), path))
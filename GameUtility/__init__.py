@@ -0,0 +1,4 @@
+"""
+Shared helpers used by the modules in Games. Nothing in here is a game on its own; import what you need from the
+individual modules, e.g. `from GameUtility.Board import GridBoard`.
+"""
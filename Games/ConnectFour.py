@@ -1,31 +1,47 @@
-import datetime
-import logging
+import asyncio
 import random
-import re
 
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility.Board import TOKENS, GridBoard
+from GameUtility.ConnectFourAI import ConnectFourSearcher
+from GameUtility.ConnectFourBitboard import ConnectFourBitboard
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
+from GameUtility.WinDetector import find_winning_line
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Implements Connect Four
     """
 
+    EDIT_BOARD_IN_PLACE = True
+
+    # Positions the bot remembers between its moves. The rest of its transposition table is dropped after each move,
+    # as an idle bot game would otherwise hold on to up to 100k of them.
+    BOT_TABLE_KEEP = 2048
+
+    # Seconds the bot opponent may think about each of its moves
+    BOT_THINK_TIME = 1.0
+
+    # Board sizes and run lengths players may ask for, as `>play C4 [width] [height] [run-length]`
+    DEFAULT_WIDTH = 7
+    DEFAULT_HEIGHT = 6
+    MIN_SIZE = 4
+    MAX_WIDTH = 12
+    MAX_HEIGHT = 10
+    DEFAULT_RUN_LENGTH = 4
+    MIN_RUN_LENGTH = 3
+
     @staticmethod
     def get_game_name():
         return "ConnectFour"
 
     @staticmethod
     def how_to_play():
-        return "ConnectFour is a game where you place tokens on a 7-width by 6-depth grid. Placing tokens makes them \"fall to the lowest point\". The purpose of the game is to get four of your tokens in a row diagonally, horizontally, or vertically. If provided, each player can customize their token to one of the following: blue, red, brown, green, yellow, purple, yellow, white. "
+        return "ConnectFour is a game where you place tokens on a 7-width by 6-depth grid (by default). Placing tokens makes them \"fall to the lowest point\". The purpose of the game is to get four of your tokens in a row diagonally, horizontally, or vertically. Start a game by yourself to play against the bot. A different width (4 to 12), depth (4 to 10) and run length can be given as numbers, e.g. `>play C4 9 7` or `>play C4 9 7 5`. If provided, each player can customize their token to one of the following: blue, red, brown, green, yellow, purple, yellow, white. "
 
     @staticmethod
     def get_game_short_name():
@@ -33,45 +49,57 @@ class GameObject(Game):
 
     async def setup(self, args):
         self.__moves = 0
-        self.__board = """
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-    """
+        self.__width = self.DEFAULT_WIDTH
+        self.__height = self.DEFAULT_HEIGHT
+        self.__run_length = self.DEFAULT_RUN_LENGTH
         self.__current_turn_index = 0
-        self._tokens = {
-            "blue": ":blue_circle:",
-            "red": ":red_circle:",
-            "green": ":green_circle:",
-            "orange": ":orange_circle:",
-            "purple": ":purple_circle:",
-            "yellow": ":yellow_circle:",
-            "white": ":white_circle:",
-            "brown": ":brown_circle:",
-        }
+        self.__bot_player = None
+        self.__searcher = None
         self._player_tokens = []
 
         logger.info('Setting up a ConnectFour game...')
 
-        if len(args) == 1 and args[0].lower() == 'help':
+        if len(args) == 1 and type(args[0]) == str and args[0].lower() == 'help':
             logger.debug('Could not setup game, invalid arguments or user requested help')
-            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (tokens-colors-player)`')
-        elif len(self.players) < 2:
-            logger.debug('Could not setup game, user provided too few users to play')
-            return SetupFailure('You can\'t play ConnectFour by yourself.')
-        elif len(args) == len(self.players) and all(type(arg) == str and arg in self._tokens for arg in args):
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (width depth) (run-length) (tokens-colors-player)`')
+        numbers = [arg for arg in args if type(arg) == int]
+        args = [arg for arg in args if type(arg) != int]
+        if len(numbers) == 1 or len(numbers) > 3:
+            logger.debug('Could not setup game, wrong amount of numbers given')
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (width depth) (run-length) (tokens-colors-player)`')
+        if numbers:
+            self.__width, self.__height = numbers[:2]
+            self.__run_length = numbers[2] if len(numbers) > 2 else min(self.DEFAULT_RUN_LENGTH, self.__width, self.__height)
+        if not (self.MIN_SIZE <= self.__width <= self.MAX_WIDTH and self.MIN_SIZE <= self.__height <= self.MAX_HEIGHT):
+            logger.debug('Could not setup game, user provided too big/small board')
+            return SetupFailure('Width must be from {} to {} and depth from {} to {}'.format(self.MIN_SIZE, self.MAX_WIDTH, self.MIN_SIZE, self.MAX_HEIGHT))
+        if not self.MIN_RUN_LENGTH <= self.__run_length <= max(self.__width, self.__height):
+            logger.debug('Could not setup game, user provided too long/short run length')
+            return SetupFailure('Run length cannot be less than {} or longer than the board'.format(self.MIN_RUN_LENGTH))
+        self.__board = GridBoard(self.__width, self.__height, ['⚫', '🔶'])
+
+        # Tokens are picked for the players who joined, and optionally the bot after them; a bot without one takes the
+        # first colour left over
+        seats = len(self.players) + (1 if len(self.players) == 1 else 0)
+        if len(set(args)) != len(args):
+            logger.debug('Could not setup game, players picked the same token')
+            return SetupFailure('Every player needs a different token colour.')
+        if len(args) in (len(self.players), seats) and all(type(arg) == str and arg in TOKENS for arg in args):
             for arg in args:
-                self._player_tokens.append(self._tokens[arg])
-        elif len(args) == 0:
-            self._player_tokens = [self._tokens[k] for k in self._tokens][:len(self.players)]
-        else:
+                self._player_tokens.append(TOKENS[arg])
+        elif len(args) != 0:
             logger.debug('Could not setup game, invalid arguments or user requested help')
-            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (tokens-colors-player)`')
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (width depth) (run-length) (tokens-colors-player)`')
+
+        if len(self.players) == 1:
+            logger.debug('Only one user, filling the other seat with the bot')
+            self.__bot_player = self.bot.user
+            self.__searcher = ConnectFourSearcher(self.__width, self.__height, self.__run_length)
+            self.players = self.players + [self.__bot_player]
+        self._player_tokens += [token for token in TOKENS.values() if token not in self._player_tokens][:len(self.players) - len(self._player_tokens)]
 
         logger.debug('Passed standard checks setting up turn...')
+        self.__engine = ConnectFourBitboard(len(self.players), self.__width, self.__height, self.__run_length)
 
         c = list(zip(self.players, self._player_tokens))
         random.shuffle(c)
@@ -85,47 +113,76 @@ class GameObject(Game):
         pidx = 0
         for player in self.players:
             if pidx == self.__current_turn_index:
-                await self.channel.send(f'{player.mention} your token is {self._player_tokens[pidx]}, you go first! Good luck!')
+                await self.send(f'{player.mention} your token is {self._player_tokens[pidx]}, you go first! Good luck!')
             else:
-                await self.channel.send(f'{player.mention} your token is {self._player_tokens[pidx]}, waiting for your turn...')
+                await self.send(f'{player.mention} your token is {self._player_tokens[pidx]}, waiting for your turn...')
             pidx += 1
 
+        if self.get_current_player() == self.__bot_player:
+            await self._bot_move()
+
         return SetupSuccess(self)
 
     async def move(self, args, player):
         logger.debug("Checking command move")
         if player != self.players[self.__current_turn_index]:
-            await self.channel.send('It is not your turn currently.')
+            await self.reject('It is not your turn currently.')
             return
-        if not args or len(args) <= 0 or args[0] == 'help' or type(args[0]) != int or args[0] > 7 or args[0] < 1:
+        if not args or len(args) <= 0 or args[0] == 'help' or type(args[0]) != int or args[0] > self.__width or args[0] < 1:
             logger.debug("Invalid move or requested help, showing help menu...")
-            await self.channel.send("**Command \'move\' Usage:** `>move [column(1-7)]`")
+            await self.reject("**Command \'move\' Usage:** `>move [column(1-{})]`".format(self.__width))
             return
         logger.debug("Checking if column is appropriate")
-        if self._get_item_at(args[0] - 1, 0) != ':black_circle:':
+        if self.__engine.is_column_full(args[0] - 1):
             logger.debug("Invalid move, column full")
-            await self.channel.send("You can't put a piece in that column, try somewhere else!")
+            await self.reject("You can't put a piece in that column, try somewhere else!")
             return
+        if not await self._drop(args[0] - 1) and self.get_current_player() == self.__bot_player:
+            await self._bot_move()
+
+    async def _drop(self, col):
+        """
+        Drop the current player's token in `col`, then either finish the game or pass the turn. Returns True if the
+        game is over.
+        """
         logger.debug("Placing...")
-        for i in range(6, -1, -1):
-            if self._get_item_at(args[0] - 1, i) == ':black_circle:':
-                self._place_item_at(args[0] - 1, i, self._player_tokens[self.__current_turn_index])
-                break
+        row = self.__engine.drop(col, self.__current_turn_index)
+        self._journal_move(self.__current_turn_index, col)
+        self._place_item_at(col, row, self._player_tokens[self.__current_turn_index])
         # Check for ending
         logger.debug("Placed, checking for next turn...")
         self.__moves += 1
-        if self._contains_connect_four():
+        with self.measure('win_check_seconds'):
+            won = self._contains_connect_four()
+        if won:
             logger.debug("Showing board...")
             await self.show()
             logger.debug("Placed piece resulted in a connect four!")
-            await self.channel.send("**{0}** wins! It took {1} turns!".format(self.players[self.__current_turn_index].name, self.__moves))
+            await self.send("**{0}** wins! It took {1} turns!".format(self.players[self.__current_turn_index].name, self.__moves))
             logger.debug("Clearing game...")
             await self.end_game()
+            return True
+        elif self.__engine.is_full():
+            logger.debug("Board is full, showing board...")
+            await self.show()
+            await self.send("It's a draw! It took {0} turns!".format(self.__moves))
+            logger.debug("Clearing game...")
+            await self.end_game()
+            return True
         else:
             logger.debug("Going to next turn...")
             self.next_turn()
             logger.debug("Showing board...")
             await self.show()
+            return False
+
+    async def _bot_move(self):
+        logger.debug("Bot is searching for a move...")
+        # Search a copy in an executor so a deep search never holds up other games on the event loop
+        col = await asyncio.get_running_loop().run_in_executor(None, self.__searcher.best_move, self.__engine.copy(), self.__current_turn_index, self.BOT_THINK_TIME)
+        self.__searcher.table.shrink(self.BOT_TABLE_KEEP)
+        logger.debug("Bot chose column {}".format(col + 1))
+        await self._drop(col)
 
     def next_turn(self):
         self.__current_turn_index = (self.__current_turn_index + 1) % len(self.players)
@@ -133,75 +190,60 @@ class GameObject(Game):
     def get_current_player(self):
         return self.players[self.__current_turn_index]
 
+    def _journal_params(self):
+        return self.__width, self.__height, self.__run_length
+
+    @staticmethod
+    def replay(params, players, moves):
+        width, height, run_length = params
+        board = GridBoard(width, height, ['.'] + [str(player + 1) for player in range(players)])
+        cells = board.cells
+        heights = [0] * width
+        for player, col, _ in moves:
+            heights[col] += 1
+            cells[(height - heights[col]) * width + col] = player + 1
+        winner = None
+        if moves:
+            player, col, _ = moves[-1]
+            if find_winning_line(board, col, height - heights[col], run_length):
+                winner = player
+        return board, winner
+
+    def _save_state(self, writer):
+        writer.u8(self.__run_length)
+        writer.u16(self.__moves)
+        writer.u8(self.__current_turn_index)
+        writer.u8(self._player_index(self.__bot_player))
+        writer.str_list(self._player_tokens)
+        writer.board(self.__board)
+
+    def _load_state(self, reader):
+        self.__run_length = reader.u8()
+        self.__moves = reader.u16()
+        self.__current_turn_index = reader.u8()
+        self.__bot_player = self._player_at(reader.u8())
+        self._player_tokens = reader.str_list()
+        self.__board = reader.board()
+        self.__width, self.__height = self.__board.width, self.__board.height
+        self.__searcher = ConnectFourSearcher(self.__width, self.__height, self.__run_length) if self.__bot_player is not None else None
+        # The bitboards are rebuilt by dropping every token again, each column from the bottom up
+        self.__engine = ConnectFourBitboard(len(self.players), self.__width, self.__height, self.__run_length)
+        for col in range(self.__width):
+            for row in reversed(range(self.__height)):
+                if not self.__board.is_empty(col, row):
+                    self.__engine.drop(col, self._player_tokens.index(self.__board.get_token(col, row)))
+
     async def show(self):
-        await self.channel.send("It's **{}'s** turn.".format(self.players[self.__current_turn_index].name) + self.__board)
+        await self.send_board("It's **{}'s** turn.".format(self.players[self.__current_turn_index].name) + self.__board.render())
 
     def _contains_connect_four(self):
-        current_check = self._player_tokens[self.__current_turn_index]
-        # Horizontal Check
-        for j in range(0, 6 - 3):
-            for i in range(0, 7):
-                if self._get_item_at(i, j) == current_check and \
-                  self._get_item_at(i, j + 1) == current_check and \
-                  self._get_item_at(i, j + 2) == current_check and \
-                  self._get_item_at(i, j + 3) == current_check:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 1, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 2, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 3, ':large_orange_diamond:')
-                    return True
-        # Vertical Check
-        for i in range(0, 7 - 3):
-            for j in range(0, 6):
-                if self._get_item_at(i, j) == current_check and \
-                  self._get_item_at(i + 1, j) == current_check and \
-                  self._get_item_at(i + 2, j) == current_check and \
-                  self._get_item_at(i + 3, j) == current_check:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 1, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 2, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 3, j, ':large_orange_diamond:')
-                    return True
-        # Ascending Diagonal Check
-        for i in range(3, 7):
-            for j in range(0, 6 - 3):
-                if self._get_item_at(i, j) == current_check and \
-                  self._get_item_at(i - 1, j + 1) == current_check and \
-                  self._get_item_at(i - 2, j + 2) == current_check and \
-                  self._get_item_at(i - 3, j + 3) == current_check:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i - 1, j + 1, ':large_orange_diamond:')
-                    self._place_item_at(i - 2, j + 2, ':large_orange_diamond:')
-                    self._place_item_at(i - 3, j + 3, ':large_orange_diamond:')
-                    return True
-        # Ascending Diagonal Check
-        for i in range(3, 7):
-            for j in range(3, 6):
-                if self._get_item_at(i, j) == current_check and \
-                  self._get_item_at(i - 1, j - 1) == current_check and \
-                  self._get_item_at(i - 2, j - 2) == current_check and \
-                  self._get_item_at(i - 3, j - 3) == current_check:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i - 1, j - 1, ':large_orange_diamond:')
-                    self._place_item_at(i - 2, j - 2, ':large_orange_diamond:')
-                    self._place_item_at(i - 3, j - 3, ':large_orange_diamond:')
-                    return True
-        return False
-
-    def _get_item_at(self, col, row):
-        for idx, emoji in enumerate(re.compile(r':[a-zA-Z0-9_]+:').finditer(self.__board)):
-            if idx % 7 == col:
-                if idx // 7 == row:
-                    return emoji.group()
+        if not self.__engine.is_win(self.__current_turn_index):
+            return False
+        logger.info("Found win! Placing win pieces!")
+        for col, row in self.__engine.winning_cells(self.__current_turn_index):
+            self._place_item_at(col, row, '🔶')
+        return True
 
     def _place_item_at(self, col, row, placer):
         logger.debug("Placing {2} at {0}, {1}".format(col, row, placer))
-        for idx, emoji in enumerate(re.compile(r':[a-zA-Z0-9_]+:').finditer(self.__board)):
-            if idx % 7 == col:
-                if idx // 7 == row:
-                    self.__board = self.__board[:emoji.start()] + placer + self.__board[emoji.end():]
-                    return
+        self.__board.set(col, row, self.__board.add_token(placer))
@@ -1,31 +1,40 @@
-import datetime
-import logging
+import asyncio
 import random
-import re
 
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility.Board import TOKENS, GridBoard
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
+from GameUtility.GomokuAI import CandidateSet, GomokuSearcher, get_pool, search_move
+from GameUtility.WinDetector import find_winning_line
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Implements Gomoku
     """
 
+    EDIT_BOARD_IN_PLACE = True
+
+    # Seconds the bot opponent may think about each of its moves
+    BOT_THINK_TIME = 2.0
+
+    # Board sizes and run lengths players may ask for, as `>play GU [size] [run-length]`
+    DEFAULT_SIZE = 10
+    MIN_SIZE = 5
+    MAX_SIZE = 19
+    DEFAULT_RUN_LENGTH = 5
+    MIN_RUN_LENGTH = 3
+
     @staticmethod
     def get_game_name():
         return "Gomoku"
 
     @staticmethod
     def how_to_play():
-        return "Gomoku is a game where you place tokens on a 10 by 10 grid. The purpose of the game is to get five of your tokens in a row diagonally, horizontally, or vertically. If provided, each player can customize their token to one of the following: blue, red, brown, green, yellow, purple, yellow, white. "
+        return "Gomoku is a game where you place tokens on a 10 by 10 grid (by default). The purpose of the game is to get five of your tokens in a row diagonally, horizontally, or vertically. Start a game by yourself to play against the bot. A bigger or smaller board (5 to 19) and run length can be given as numbers, e.g. `>play GU 15` or `>play GU 19 6`. If provided, each player can customize their token to one of the following: blue, red, brown, green, yellow, purple, yellow, white. "
 
     @staticmethod
     def get_game_short_name():
@@ -33,47 +42,54 @@ class GameObject(Game):
 
     async def setup(self, args):
         self.__moves = 0
-        self.__board = """
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-:black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle::black_circle:
-    """
+        self.__size = self.DEFAULT_SIZE
+        self.__run_length = self.DEFAULT_RUN_LENGTH
         self.__current_turn_index = 0
-        self._tokens = {
-            "blue": ":blue_circle:",
-            "red": ":red_circle:",
-            "green": ":green_circle:",
-            "orange": ":orange_circle:",
-            "purple": ":purple_circle:",
-            "yellow": ":yellow_circle:",
-            "white": ":white_circle:",
-            "brown": ":brown_circle:",
-        }
+        self.__bot_player = None
+        # Cells the bot considers, kept up to date as stones are placed. Only games with the bot have them.
+        self.__candidates = None
         self._player_tokens = []
 
         logger.info('Setting up a Gomoku game...')
 
-        if len(args) == 1 and args[0].lower() == 'help':
+        if len(args) == 1 and type(args[0]) == str and args[0].lower() == 'help':
             logger.debug('Could not setup game, invalid arguments or user requested help')
-            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (tokens-colors-player)`')
-        elif len(self.players) < 2:
-            logger.debug('Could not setup game, user provided too few users to play')
-            return SetupFailure('You can\'t play Gomoku by yourself.')
-        elif len(args) == len(self.players) and all(type(arg) == str and arg in self._tokens for arg in args):
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (board-size) (run-length) (tokens-colors-player)`')
+        numbers = [arg for arg in args if type(arg) == int]
+        args = [arg for arg in args if type(arg) != int]
+        if len(numbers) > 2:
+            logger.debug('Could not setup game, too many numbers given')
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (board-size) (run-length) (tokens-colors-player)`')
+        if numbers:
+            self.__size = numbers[0]
+            self.__run_length = numbers[1] if len(numbers) > 1 else min(self.DEFAULT_RUN_LENGTH, self.__size)
+        if not self.MIN_SIZE <= self.__size <= self.MAX_SIZE:
+            logger.debug('Could not setup game, user provided too big/small board')
+            return SetupFailure('Board size cannot be less than {} or greater than {}'.format(self.MIN_SIZE, self.MAX_SIZE))
+        if not self.MIN_RUN_LENGTH <= self.__run_length <= self.__size:
+            logger.debug('Could not setup game, user provided too long/short run length')
+            return SetupFailure('Run length cannot be less than {} or greater than the board size'.format(self.MIN_RUN_LENGTH))
+        self.__board = GridBoard(self.__size, self.__size, ['⚫', '🔶'])
+
+        # Tokens are picked for the players who joined, and optionally the bot after them; a bot without one takes the
+        # first colour left over
+        seats = len(self.players) + (1 if len(self.players) == 1 else 0)
+        if len(set(args)) != len(args):
+            logger.debug('Could not setup game, players picked the same token')
+            return SetupFailure('Every player needs a different token colour.')
+        if len(args) in (len(self.players), seats) and all(type(arg) == str and arg in TOKENS for arg in args):
             for arg in args:
-                self._player_tokens.append(self._tokens[arg])
-        elif len(args) == 0:
-            self._player_tokens = [self._tokens[k] for k in self._tokens][:len(self.players)]
-        else:
+                self._player_tokens.append(TOKENS[arg])
+        elif len(args) != 0:
             logger.debug('Could not setup game, invalid arguments or user requested help')
-            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (tokens-colors-player)`')
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [users-to-play] (board-size) (run-length) (tokens-colors-player)`')
+
+        if len(self.players) == 1:
+            logger.debug('Only one user, filling the other seat with the bot')
+            self.__bot_player = self.bot.user
+            self.__candidates = CandidateSet(self.__size)
+            self.players = self.players + [self.__bot_player]
+        self._player_tokens += [token for token in TOKENS.values() if token not in self._player_tokens][:len(self.players) - len(self._player_tokens)]
 
         logger.debug('Passed standard checks setting up turn...')
 
@@ -89,44 +105,87 @@ class GameObject(Game):
         pidx = 0
         for player in self.players:
             if pidx == self.__current_turn_index:
-                await self.channel.send(f'{player.mention} your token is {self._player_tokens[pidx]}, you go first! Good luck!')
+                await self.send(f'{player.mention} your token is {self._player_tokens[pidx]}, you go first! Good luck!')
             else:
-                await self.channel.send(f'{player.mention} your token is {self._player_tokens[pidx]}, waiting for your turn...')
+                await self.send(f'{player.mention} your token is {self._player_tokens[pidx]}, waiting for your turn...')
             pidx += 1
 
+        if self.get_current_player() == self.__bot_player:
+            await self._bot_move()
+
         return SetupSuccess(self)
 
     async def move(self, args, player):
         logger.debug("Checking command move")
         if player != self.players[self.__current_turn_index]:
-            await self.channel.send('It is not your turn currently.')
+            await self.reject('It is not your turn currently.')
             return
-        if not args or len(args) <= 1 or type(args[0]) != int or type(args[1]) != int or args[0] > 10 or args[0] < 1 or args[1] > 10 or args[1] < 1:
+        if not args or len(args) <= 1 or type(args[0]) != int or type(args[1]) != int or not self.__board.is_valid(args[0] - 1, args[1] - 1):
             logger.debug("Invalid move or requested help, showing help menu...")
-            await self.channel.send("**Command \'move\' Usage:** `>move [column(1-10)] [row(1-10)]`")
+            await self.reject("**Command \'move\' Usage:** `>move [column(1-{0})] [row(1-{0})]`".format(self.__size))
             return
         logger.debug("Checking if place is appropriate")
-        if self._get_item_at(args[0] - 1, args[1] - 1) != ':black_circle:':
+        if not self.__board.is_empty(args[0] - 1, args[1] - 1):
             logger.debug("Invalid move, column full")
-            await self.channel.send("You can't put a piece in that spot, try somewhere else!")
+            await self.reject("You can't put a piece in that spot, try somewhere else!")
             return
+        if not await self._place(args[0] - 1, args[1] - 1) and self.get_current_player() == self.__bot_player:
+            await self._bot_move()
+
+    async def _place(self, col, row):
+        """
+        Place the current player's token at (col, row), then either finish the game or pass the turn. Returns True if
+        the game is over.
+        """
         logger.debug("Placing...")
-        self._place_item_at(args[0] - 1, args[1] - 1, self._player_tokens[self.__current_turn_index])
+        self._place_item_at(col, row, self._player_tokens[self.__current_turn_index])
+        if self.__candidates is not None:
+            self.__candidates.play(self.__board.cells, row * self.__size + col)
+        self._journal_move(self.__current_turn_index, row * self.__size + col)
         # Check for ending
         logger.debug("Placed, checking for next turn...")
         self.__moves += 1
-        if self._contains_connect_five():
+        with self.measure('win_check_seconds'):
+            won = self._contains_connect_five(col, row)
+        if won:
             logger.debug("Showing board...")
             await self.show()
             logger.debug("Placed piece resulted in a connect five!")
-            await self.channel.send("**{0}** wins! It took {1} turns!".format(self.players[self.__current_turn_index].name, self.__moves))
+            await self.send("**{0}** wins! It took {1} turns!".format(self.players[self.__current_turn_index].name, self.__moves))
             logger.debug("Clearing game...")
             await self.end_game()
+            return True
+        elif self.__moves == self.__size * self.__size:
+            logger.debug("Board is full, showing board...")
+            await self.show()
+            await self.send("It's a draw! It took {0} turns!".format(self.__moves))
+            logger.debug("Clearing game...")
+            await self.end_game()
+            return True
         else:
             logger.debug("Going to next turn...")
             self.next_turn()
             logger.debug("Showing board...")
             await self.show()
+            return False
+
+    async def _bot_move(self):
+        logger.debug("Bot is searching for a move...")
+        me = self.__board.add_token(self._player_tokens[self.__current_turn_index])
+        them = self.__board.add_token(self._player_tokens[1 - self.__current_turn_index])
+        state = (self.__size, self.__run_length, bytes(self.__board.cells), frozenset(self.__candidates.cells), me, them)
+        # Search in the process pool so concurrent bot games each get a core and the event loop stays free
+        future = asyncio.get_running_loop().run_in_executor(get_pool(), search_move, *state, self.BOT_THINK_TIME)
+        try:
+            idx = await asyncio.wait_for(future, self.BOT_THINK_TIME * 2)
+        except asyncio.TimeoutError:
+            # wait_for has cancelled the search, so it won't start if it was still queued; one already running stops
+            # by itself once its own BOT_THINK_TIME deadline passes
+            logger.warning("Bot search overran its time limit, falling back to the pattern score")
+            idx = await asyncio.get_running_loop().run_in_executor(None, GomokuSearcher(*state).quick_move)
+        col, row = idx % self.__size, idx // self.__size
+        logger.debug("Bot chose {}, {}".format(col + 1, row + 1))
+        await self._place(col, row)
 
     def next_turn(self):
         self.__current_turn_index = (self.__current_turn_index + 1) % len(self.players)
@@ -134,82 +193,52 @@ class GameObject(Game):
     def get_current_player(self):
         return self.players[self.__current_turn_index]
 
+    def _journal_params(self):
+        return self.__size, self.__run_length
+
+    @staticmethod
+    def replay(params, players, moves):
+        size, run_length = params
+        board = GridBoard(size, size, ['.'] + [str(player + 1) for player in range(players)])
+        cells = board.cells
+        for player, idx, _ in moves:
+            cells[idx] = player + 1
+        winner = None
+        if moves:
+            player, idx, _ = moves[-1]
+            if find_winning_line(board, idx % size, idx // size, run_length):
+                winner = player
+        return board, winner
+
+    def _save_state(self, writer):
+        writer.u8(self.__run_length)
+        writer.u16(self.__moves)
+        writer.u8(self.__current_turn_index)
+        writer.u8(self._player_index(self.__bot_player))
+        writer.str_list(self._player_tokens)
+        writer.board(self.__board)
+
+    def _load_state(self, reader):
+        self.__run_length = reader.u8()
+        self.__moves = reader.u16()
+        self.__current_turn_index = reader.u8()
+        self.__bot_player = self._player_at(reader.u8())
+        self._player_tokens = reader.str_list()
+        self.__board = reader.board()
+        self.__size = self.__board.width
+        self.__candidates = CandidateSet.from_cells(self.__size, self.__board.cells) if self.__bot_player is not None else None
+
     async def show(self):
-        await self.channel.send("It's **{}'s** turn.".format(self.players[self.__current_turn_index].name) + self.__board)
-
-    def _contains_connect_five(self):
-        checker = self._player_tokens[self.__current_turn_index]
-        # Horizontal Check
-        for j in range(0, 10 - 4):
-            for i in range(0, 10):
-                if self._get_item_at(i, j) == checker and \
-                  self._get_item_at(i, j + 1) == checker and \
-                  self._get_item_at(i, j + 2) == checker and \
-                  self._get_item_at(i, j + 3) == checker and \
-                  self._get_item_at(i, j + 4) == checker:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 1, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 2, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 3, ':large_orange_diamond:')
-                    self._place_item_at(i, j + 4, ':large_orange_diamond:')
-                    return True
-        # Vertical Check
-        for i in range(0, 10 - 3):
-            for j in range(0, 10):
-                if self._get_item_at(i, j) == checker and \
-                  self._get_item_at(i + 1, j) == checker and \
-                  self._get_item_at(i + 2, j) == checker and \
-                  self._get_item_at(i + 3, j) == checker and \
-                  self._get_item_at(i + 4, j) == checker:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 1, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 2, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 3, j, ':large_orange_diamond:')
-                    self._place_item_at(i + 4, j, ':large_orange_diamond:')
-                    return True
-        # Ascending Diagonal Check
-        for i in range(4, 10):
-            for j in range(0, 10 - 4):
-                if self._get_item_at(i, j) == checker and \
-                  self._get_item_at(i - 1, j + 1) == checker and \
-                  self._get_item_at(i - 2, j + 2) == checker and \
-                  self._get_item_at(i - 3, j + 3) == checker and \
-                  self._get_item_at(i - 4, j + 4) == checker:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i - 1, j + 1, ':large_orange_diamond:')
-                    self._place_item_at(i - 2, j + 2, ':large_orange_diamond:')
-                    self._place_item_at(i - 3, j + 3, ':large_orange_diamond:')
-                    self._place_item_at(i - 4, j + 4, ':large_orange_diamond:')
-                    return True
-        # Ascending Diagonal Check
-        for i in range(4, 10):
-            for j in range(4, 10):
-                if self._get_item_at(i, j) == checker and \
-                  self._get_item_at(i - 1, j - 1) == checker and \
-                  self._get_item_at(i - 2, j - 2) == checker and \
-                  self._get_item_at(i - 3, j - 3) == checker and \
-                  self._get_item_at(i - 4, j - 4) == checker:
-                    logger.info("Found win! Placing win pieces!")
-                    self._place_item_at(i, j, ':large_orange_diamond:')
-                    self._place_item_at(i - 1, j - 1, ':large_orange_diamond:')
-                    self._place_item_at(i - 2, j - 2, ':large_orange_diamond:')
-                    self._place_item_at(i - 3, j - 3, ':large_orange_diamond:')
-                    self._place_item_at(i - 4, j - 4, ':large_orange_diamond:')
-                    return True
-        return False
-
-    def _get_item_at(self, col, row):
-        for idx, emoji in enumerate(re.compile(r':[a-zA-Z0-9_]+:').finditer(self.__board)):
-            if idx % 10 == col:
-                if idx // 10 == row:
-                    return emoji.group()
+        await self.send_board("It's **{}'s** turn.".format(self.players[self.__current_turn_index].name) + self.__board.render())
+
+    def _contains_connect_five(self, col, row):
+        line = find_winning_line(self.__board, col, row, self.__run_length)
+        if line is None:
+            return False
+        logger.info("Found win! Placing win pieces!")
+        for c, r in line:
+            self._place_item_at(c, r, '🔶')
+        return True
 
     def _place_item_at(self, col, row, placer):
-        for idx, emoji in enumerate(re.compile(r':[a-zA-Z0-9_]+:').finditer(self.__board)):
-            if idx % 10 == col:
-                if idx // 10 == row:
-                    self.__board = self.__board[:emoji.start()] + placer + self.__board[emoji.end():]
-                    return
+        self.__board.set(col, row, self.__board.add_token(placer))
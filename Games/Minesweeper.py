@@ -1,31 +1,37 @@
-import datetime
-import logging
+import asyncio
+import functools
 import random
-import math
+from collections import deque
 
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
+from GameUtility.MinesweeperSolver import generate_no_guess, mine_probabilities
+from GameUtility.Outbox import MESSAGE_LIMIT
+from GameUtility.Snapshot import SnapshotError
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Implements Minesweeper
     """
 
+    EDIT_BOARD_IN_PLACE = True
+
+    MIN_SIZE = 2
+    MAX_SIZE = 50
+    # Boards with more cells than this work out hints off the event loop
+    HINT_INLINE_CELLS = 256
+
     @staticmethod
     def get_game_name():
         return "Minesweeper"
 
     @staticmethod
     def how_to_play():
-        return "RussianRoulette is a game played where on each turn the users spins a virtual chamber where 1 in 6 bullets are filled. The user fires and lives or dies. If they live, then they pass the gun to the next user. The process continues until the gun is discharged. If you invoke this game with an integer argument, that integer will determine the amount of chambers present in the gun. If you invoke this with a boolean that toggles whether or not last man standing is enabled or not."
+        return "Minesweeper is a game where you uncover the cells of a board hiding mines. Every uncovered cell shows how many of its eight neighbours are mines; uncover every cell that isn't a mine to win, but uncover a mine and you blow up. Your first cell is never a mine. Start a game with `>play MS [size] [mines]` for a square board or `>play MS [width] [height] [mines]`, up to 50 by 50 (expert is 30 16 99). Add `true` at the end for a board that never needs a guess: the game opens the first area for you, and every cell after that can be worked out by logic. Boards too big for one message show a window around your last move; look elsewhere with `>move view [column] [row]`. Stuck? `>move hint` shows how likely each covered cell is to be a mine and points out the safest one."
 
     @staticmethod
     def get_game_short_name():
@@ -33,160 +39,361 @@ class GameObject(Game):
 
     async def setup(self, args):
         logger.info('Setting up a Minesweeper game...')
-        print(args)
-        if len(args) != 3 or (len(args) == 1 and args[0].lower() == 'help'):
+        self.__no_guess = bool(args) and type(args[-1]) == bool and args[-1]
+        if args and type(args[-1]) == bool:
+            args = args[:-1]
+        if len(args) not in (3, 4) or any(type(arg) != int for arg in args[1:]):
             logger.debug('Could not setup game, invalid arguments or user requested help')
-            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [board-size, amount-of-bombs]`')
+            return SetupFailure(f'**Command \'play {self.get_game_short_name()}\' Usage: **`>play {self.get_game_short_name()} [board-size, amount-of-bombs] (no-guess)` or `>play {self.get_game_short_name()} [width, height, amount-of-bombs] (no-guess)`')
         elif len(self.players) > 1:
             logger.debug('Could not setup game, user provided too many users to play')
             return SetupFailure('You can\'t play Minesweeper with other people.')
-        elif type(args[1]) != int or args[1] > 9 or args[1] < 2:
+        width, height, mines = args[1:] if len(args) == 4 else (args[1], args[1], args[2])
+        if not (self.MIN_SIZE <= width <= self.MAX_SIZE and self.MIN_SIZE <= height <= self.MAX_SIZE):
             logger.debug('Could not setup game, user provided too big/small playfield')
-            return SetupFailure('Board size cannot be less than 2 or greater than 9')
-        elif type(args[2]) != int or args[2] < 1 or args[2] >= (args[1] ** 2):
+            return SetupFailure('Board size cannot be less than {} or greater than {}'.format(self.MIN_SIZE, self.MAX_SIZE))
+        elif mines < 1 or mines >= width * height:
             logger.debug('Could not setup game, user provided too many/few bombs')
             return SetupFailure('Bomb count cannot be less than 1 or greater than the size of the board.')
         logger.debug('Passed standard checks setting up turn...')
 
-        self.__board = MineSweeperBoard(args[1], args[2]), MineSweeperBoard(args[1], args[2])
-        amount = args[2]
-        solved = self.__board[0]
-        nbombs = 0
-        while nbombs != amount:
-            for x in range(len(solved.board)):
-                if nbombs == amount:
-                    break
-                t = random.randint(0, len(solved.board) - 1)
-                t2 = random.randint(0, len(solved.board) - 1)
-                if math.floor(random.random() * len(solved.board)) % 2 == 0:
-                    if not solved.is_mine(t, t2):
-                        solved.board[t][t2] = '\N{BOMB}'
-                        nbombs += 1
-
-        for row in range(len(solved.board)):
-            for col in range(len(solved.board[row])):
-                if solved.is_mine(row, col):
-                    continue
-                solved.board[row][col] = str(solved.count_mines(row, col))
-
-        await self.channel.send(f'{self.players[0].mention}, you are good to start! Just don\'t blow up :)')
+        self.__board = MineSweeperBoard(width, height, mines)
+        self.__view = (width // 2, height // 2)
+        # Mines are only placed on the first move, so the first cell uncovered is never one. Keep the seed so the
+        # board can be reproduced from the logs.
+        self.__seed = random.randrange(2 ** 32)
+        logger.debug('Board will be seeded with {}'.format(self.__seed))
+
+        await self.send(f'{self.players[0].mention}, you are good to start! Just don\'t blow up :)')
+        if self.__no_guess:
+            logger.debug('Generating a board that needs no guesses...')
+            col, row = self.__view
+            await self._place_mines(row * width + col)
+            self._journal_move(0, row * width + col)
+            self.__board.reveal(row * width + col)
+            if self.__board.is_cleared():
+                await self.send_board(self.__board.render(self.__view, solved=True))
+                await self.end_game()
+                await self.send('That was easy, the first move cleared the board! You won!')
+                return SetupSuccess(self)
         await self.show()
         return SetupSuccess(self)
 
     async def move(self, args, player):
+        board = self.__board
+        if len(args) == 3 and args[0] == 'view' and type(args[1]) == int and type(args[2]) == int:
+            logger.debug("Moving the view...")
+            self._not_a_move()
+            self.__view = (min(max(args[1] - 1, 0), board.width - 1), min(max(args[2] - 1, 0), board.height - 1))
+            await self.show()
+            return
+        if len(args) == 1 and args[0] == 'hint':
+            logger.debug("Working out a hint...")
+            self._not_a_move()
+            await self._hint()
+            return
         if len(args) != 2 or type(args[0]) != int or type(args[1]) != int:
             logger.debug("Invalid move or requested help, showing help menu...")
-            await self.channel.send("**Command \'move\' Usage:** `>move [column(1-{0})] [row(1-{0})]`".format(self.__board[0].size))
+            await self.reject("**Command \'move\' Usage:** `>move [column(1-{})] [row(1-{})]`, `>move view [column] [row]` or `>move hint`".format(board.width, board.height))
             return
 
-        y, x = args[0] - 1, args[1] - 1
-
-        if not self.__board[0].is_valid(x, y):
-            return await self.channel.send('Invalid position selected')
+        col, row = args[0] - 1, args[1] - 1
 
-        if self.__board[1].board[x][y] != '\N{BLACK QUESTION MARK ORNAMENT}':
-            return await self.channel.send('Position already uncovered')
+        if not board.is_valid(col, row):
+            return await self.reject('Invalid position selected')
 
-        if not self.__board[0].is_mine(x, y):
-            self.__board[1].board[x][y] = self.__board[0].count_mines(x, y)
-            self.__board[1].moves += 1
+        idx = row * board.width + col
+        if board.is_revealed(idx):
+            return await self.reject('Position already uncovered')
 
-            await self.show()
+        if not board.mines_placed:
+            logger.debug('First move, placing mines...')
+            await self._place_mines(idx)
 
-        if self.__board[0].is_mine(x, y):
-            await self.channel.send(self.__board[0].parse())
+        self._journal_move(0, idx)
+        self.__view = (col, row)
+        if board.is_mine(idx):
+            await self.send_board(board.render(self.__view, solved=True))
             logger.debug('Clearing game...')
             await self.end_game()
             logger.debug('Player has lost, sending message')
-            await self.channel.send('You blew up!')
+            await self.send('You blew up!')
+            return
 
-        if self.__board[1].moves + self.__board[1].bombs == self.__board[1].size ** 2:
-            await self.channel.send(self.__board[0].parse())
+        board.reveal(idx)
+        if board.is_cleared():
+            await self.send_board(board.render(self.__view, solved=True))
             logger.debug('Clearing game...')
             await self.end_game()
             logger.debug('Player has won, sending message')
-            await self.channel.send('You won! Congratulations!')
+            await self.send('You won! Congratulations!')
+        else:
+            await self.show()
+
+    async def _place_mines(self, first):
+        if not self.__no_guess:
+            self.__board.place_mines(first, random.Random(self.__seed))
+            return
+        # Generating can take a while on big, dense boards, so keep it off the event loop
+        solvable = await asyncio.get_running_loop().run_in_executor(None, self.__board.place_mines, first, random.Random(self.__seed), True)
+        if not solvable:
+            # Journaled as an ordinary game, so replaying it places the same random mines without searching again
+            logger.info('Could not generate a board without guesses, using a random one')
+            self.__no_guess = False
+            self.__board.place_mines(first, random.Random(self.__seed))
+            await self.send('I couldn\'t make a board that needs no guessing with that many bombs, you may need some luck!')
+
+    async def _hint(self):
+        board = self.__board
+        if not board.mines_placed:
+            await self.send('Nothing is uncovered yet, and your first cell is never a mine, so pick any cell you like!')
+            return
+        compute = functools.partial(mine_probabilities, board.neighbours, board.counts, board.revealed_bits, board.mines)
+        if board.width * board.height > self.HINT_INLINE_CELLS:
+            probabilities, exact = await asyncio.get_running_loop().run_in_executor(None, compute)
+        else:
+            probabilities, exact = compute()
+        # Of the safest cells, point out the one nearest the current view
+        col, row = self.__view
+        safest = min(probabilities, key=lambda idx: (probabilities[idx], abs(idx % board.width - col) + abs(idx // board.width - row)))
+        chance = probabilities[safest]
+        certain = sum(1 for probability in probabilities.values() if probability == 0)
+        await self.send(board.render_hint(probabilities, safest))
+        if certain:
+            advice = '{} covered cell{} can\'t be a mine. Try column {}, row {}.'.format(certain, '' if certain == 1 else 's', safest % board.width + 1, safest // board.width + 1)
+        else:
+            advice = 'There is no sure thing, you\'ll have to guess. Your best bet is column {}, row {}, with a {:.1%} chance of a mine{}.'.format(safest % board.width + 1, safest // board.width + 1, chance, '' if exact else ' (roughly, the board is too tangled to count exactly)')
+        await self.send('{}\n{} safe {} mine {} under 20% {} under 50% {} under 80% {} likely mine {} safest'.format(advice, *HINT_MARKS, SAFEST))
+
+    def _journal_params(self):
+        return self.__board.width, self.__board.height, self.__board.mines, self.__seed, self.__no_guess
+
+    @staticmethod
+    def replay(params, players, moves):
+        width, height, mines, seed, no_guess = params
+        board = MineSweeperBoard(width, height, mines)
+        for _, idx, _ in moves:
+            if not board.mines_placed:
+                board.place_mines(idx, random.Random(seed), no_guess)
+            if board.is_mine(idx):
+                return board, None
+            board.reveal(idx)
+        return board, 0 if board.is_cleared() else None
+
+    def _save_state(self, writer):
+        board = self.__board
+        writer.u32(self.__seed)
+        writer.bool(self.__no_guess)
+        writer.u16(board.width)
+        writer.u16(board.height)
+        writer.u16(board.mines)
+        writer.bool(board.mines_placed)
+        writer.bytes(board.mine_bits.to_bytes(board.cell_bytes, 'little'))
+        writer.bytes(board.revealed_bits.to_bytes(board.cell_bytes, 'little'))
+
+    def _load_state(self, reader):
+        self.__seed = reader.u32()
+        self.__no_guess = reader.bool()
+        board = MineSweeperBoard(reader.u16(), reader.u16(), reader.u16())
+        mines_placed = reader.bool()
+        mine_bits, revealed_bits = reader.bytes(), reader.bytes()
+        if len(mine_bits) != board.cell_bytes or len(revealed_bits) != board.cell_bytes:
+            raise SnapshotError('Snapshot board is inconsistent')
+        if mines_placed:
+            board.set_mines(int.from_bytes(mine_bits, 'little'))
+        board.revealed_bits = int.from_bytes(revealed_bits, 'little')
+        board.revealed = bin(board.revealed_bits).count('1')
+        self.__board = board
+        self.__view = (board.width // 2, board.height // 2)
 
     async def show(self):
-        board = self.__board[1].parse()
-        await self.channel.send(board)
+        await self.send_board(self.__board.render(self.__view))
+
+
+NUMBERS = ('0️⃣', '1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣')
+HIDDEN = '\N{BLACK QUESTION MARK ORNAMENT}'
+MINE = '\N{BOMB}'
+# Covered cells on a hint: certainly safe, certainly a mine, then by chance of a mine under 20%, 50%, 80% and above
+HINT_MARKS = ('\N{WHITE HEAVY CHECK MARK}', '\N{TRIANGULAR FLAG ON POST}', '\N{LARGE GREEN SQUARE}', '\N{LARGE YELLOW SQUARE}', '\N{LARGE ORANGE SQUARE}', '\N{LARGE RED SQUARE}')
+SAFEST = '\N{WHITE MEDIUM STAR}'
+
+# Characters a rendered cell may take at most (a keycap number is three code points) and room left for the header
+CELL_WIDTH = 3
+HEADER_ROOM = 120
+
+# Board sizes whose neighbour tables are kept for new games. A 50x50 table is about 800 KiB, and players can ask for
+# any of a couple of thousand sizes, so only the most recently used are kept; running games hold on to their own.
+NEIGHBOUR_TABLES = 16
+
+
+@functools.lru_cache(maxsize=NEIGHBOUR_TABLES)
+def neighbour_table(width, height):
+    """
+    The indexes of the neighbours of every cell of a `width` x `height` board, shared by games of the same size
+    """
+    table = []
+    for idx in range(width * height):
+        row, col = divmod(idx, width)
+        table.append(tuple(r * width + c for r in range(max(0, row - 1), min(height, row + 2)) for c in range(max(0, col - 1), min(width, col + 2)) if (r, c) != (row, col)))
+    return tuple(table)
 
 
 class MineSweeperBoard:
-    def __init__(self, size: int, bombs: int):
-        self.board = []
-        for nrow in range(size):
-            row = nrow
-            self.board.append([])
-            for ncol in range(size):
-                self.board[row].append('\N{BLACK QUESTION MARK ORNAMENT}')
-        self.size = size
-        self.bombs = int(bombs)
-        self.moves = 0
-
-    def parse(self):
-        ret = ''
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                ret += self.board[row][col]
-            ret += '\n'
-        return ret
-
-    def is_mine(self, row, col):
-        return self.board[row][col] == '\N{BOMB}'
-
-    def is_valid(self, row, col):
-        return (row >= 0) and (row < self.size) and (col >= 0) and (col < self.size)
-
-    def count_mines(self, row, col):
-        count = 0
-
-        # Up
-        if self.is_valid(row - 1, col):
-            if self.is_mine(row - 1, col):
-                count += 1
-
-        # Down
-        if self.is_valid(row + 1, col):
-            if self.is_mine(row + 1, col):
-                count += 1
-
-        # Right
-        if self.is_valid(row, col + 1):
-            if self.is_mine(row, col + 1):
-                count += 1
-
-        # Left
-        if self.is_valid(row, col - 1):
-            if self.is_mine(row, col - 1):
-                count += 1
-
-        # Top Right
-        if self.is_valid(row - 1, col + 1):
-            if self.is_mine(row - 1, col + 1):
-                count += 1
-
-        # Top Left
-        if self.is_valid(row - 1, col - 1):
-            if self.is_mine(row - 1, col - 1):
-                count += 1
-
-        # Bottom Right
-        if self.is_valid(row + 1, col + 1):
-            if self.is_mine(row + 1, col + 1):
-                count += 1
-
-        # Bottom Left
-        if self.is_valid(row + 1, col - 1):
-            if self.is_mine(row + 1, col - 1):
-                count += 1
-
-        if self.is_valid(row, col):
-            if self.is_mine(row, col):
-                return
-
-        nums = {'0': ':zero:', '1': ':one:', '2': ':two:',
-         '3': ':three:', '4': ':four:', '5': ':five:',
-         '6': ':six:', '7': ':seven:', '8': ':eight:'}
-
-        return nums.get(str(count))
+    """
+    A Minesweeper board kept as two bitsets over the cells, numbered row by row: where the mines are and which cells
+    have been uncovered. Neighbouring mine counts are worked out once, when the mines are placed, into one byte per
+    cell. An expert board (30x16) is a few hundred bytes.
+
+    Only a window of the board is rendered when the whole board won't fit in one message.
+    """
+
+    __slots__ = ('width', 'height', 'mines', 'cell_bytes', 'neighbours', 'mine_bits', 'revealed_bits', 'revealed', 'counts', 'mines_placed')
+
+    def __init__(self, width: int, height: int, mines: int):
+        self.width = width
+        self.height = height
+        self.mines = int(mines)
+        self.cell_bytes = (width * height + 7) // 8
+        self.neighbours = neighbour_table(width, height)
+        self.mine_bits = 0
+        self.revealed_bits = 0
+        self.revealed = 0
+        self.counts = None
+        self.mines_placed = False
+
+    def is_valid(self, col, row):
+        return 0 <= col < self.width and 0 <= row < self.height
+
+    def is_mine(self, idx):
+        return self.mine_bits >> idx & 1
+
+    def is_revealed(self, idx):
+        return self.revealed_bits >> idx & 1
+
+    def is_cleared(self):
+        return self.revealed + self.mines == self.width * self.height
+
+    def place_mines(self, safe, rng=random, no_guess=False):
+        """
+        Place exactly `mines` mines uniformly at random, never on the cell `safe`. The safe cell's neighbours are kept
+        clear too when the board has room, so the first move opens an area.
+
+        With `no_guess` the board is one that can be cleared from `safe` by logic alone, if such a board can be found
+        quickly. Returns whether it is.
+        """
+        if no_guess:
+            bits = generate_no_guess(self.neighbours, self.mines, safe, rng)
+            if bits is not None:
+                self.set_mines(bits)
+                return True
+        excluded = {safe}
+        if self.mines <= self.width * self.height - 1 - len(self.neighbours[safe]):
+            excluded.update(self.neighbours[safe])
+        cells = [idx for idx in range(self.width * self.height) if idx not in excluded]
+        bits = 0
+        for idx in rng.sample(cells, self.mines):
+            bits |= 1 << idx
+        self.set_mines(bits)
+        return False
+
+    def set_mines(self, bits):
+        """
+        Use the bitset `bits` as the mines and count every cell's neighbouring mines
+        """
+        self.mine_bits = bits
+        self.counts = bytearray(self.width * self.height)
+        for idx in range(self.width * self.height):
+            if bits >> idx & 1:
+                for neighbour in self.neighbours[idx]:
+                    self.counts[neighbour] += 1
+        self.mines_placed = True
+
+    def reveal(self, idx):
+        """
+        Uncover `idx`. If it has no neighbouring mines, keep uncovering outwards through every connected empty cell
+        and the numbered cells bordering them, breadth first. Returns the number of cells uncovered.
+        """
+        revealed_bits = self.revealed_bits | 1 << idx
+        revealed = 1
+        queue = deque([idx])
+        while queue:
+            cell = queue.popleft()
+            if self.counts[cell]:
+                continue
+            for neighbour in self.neighbours[cell]:
+                if not revealed_bits >> neighbour & 1:
+                    revealed_bits |= 1 << neighbour
+                    revealed += 1
+                    queue.append(neighbour)
+        self.revealed_bits = revealed_bits
+        self.revealed += revealed
+        return revealed
+
+    def view_size(self):
+        """
+        The columns and rows of the largest window that renders within the message limit, keeping the board's shape
+        """
+        budget = (MESSAGE_LIMIT - HEADER_ROOM) // CELL_WIDTH
+        width, height = self.width, self.height
+        while width * height + height > budget:
+            if width * self.height >= height * self.width:
+                width -= 1
+            else:
+                height -= 1
+        return width, height
+
+    def _window(self, center):
+        """
+        The columns and rows shown around `center` (col, row), as (left, top, width, height), and the header saying
+        which part of the board that is, if it isn't all of it
+        """
+        view_width, view_height = self.view_size()
+        left = min(max(center[0] - view_width // 2, 0), self.width - view_width)
+        top = min(max(center[1] - view_height // 2, 0), self.height - view_height)
+        lines = []
+        if (view_width, view_height) != (self.width, self.height):
+            lines.append('Columns {}-{}, rows {}-{} of {}x{}'.format(left + 1, left + view_width, top + 1, top + view_height, self.width, self.height))
+        return (left, top, view_width, view_height), lines
+
+    def render(self, center=(0, 0), solved=False):
+        """
+        Render the window of the board around the cell `center` (col, row), with every mine and count shown if
+        `solved`. A header says which part of the board is shown when it isn't all of it.
+        """
+        (left, top, view_width, view_height), lines = self._window(center)
+        mine_bits, revealed_bits, counts = self.mine_bits, self.revealed_bits, self.counts
+        for row in range(top, top + view_height):
+            cells = []
+            for idx in range(row * self.width + left, row * self.width + left + view_width):
+                if solved and mine_bits >> idx & 1:
+                    cells.append(MINE)
+                elif solved or revealed_bits >> idx & 1:
+                    cells.append(NUMBERS[counts[idx]] if counts is not None else HIDDEN)
+                else:
+                    cells.append(HIDDEN)
+            lines.append(''.join(cells))
+        return '\n'.join(lines) + '\n'
+
+    def render_hint(self, probabilities, safest):
+        """
+        Render the window around the cell `safest` with every covered cell marked by its chance of being a mine, from
+        `probabilities` ({cell: chance}), and `safest` starred
+        """
+        (left, top, view_width, view_height), lines = self._window((safest % self.width, safest // self.width))
+        for row in range(top, top + view_height):
+            cells = []
+            for idx in range(row * self.width + left, row * self.width + left + view_width):
+                if self.revealed_bits >> idx & 1:
+                    cells.append(NUMBERS[self.counts[idx]])
+                elif idx == safest:
+                    cells.append(SAFEST)
+                else:
+                    probability = probabilities[idx]
+                    if probability == 0:
+                        cells.append(HINT_MARKS[0])
+                    elif probability == 1:
+                        cells.append(HINT_MARKS[1])
+                    else:
+                        cells.append(HINT_MARKS[2 + (probability >= 0.2) + (probability >= 0.5) + (probability >= 0.8)])
+            lines.append(''.join(cells))
+        return '\n'.join(lines) + '\n'
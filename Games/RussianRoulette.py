@@ -1,19 +1,13 @@
-import datetime
-import logging
 import random
 
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Implements Russian Roulette
     """
@@ -71,15 +65,15 @@ class GameObject(Game):
         logger.debug('Passed standard checks setting up turn...')
         random.shuffle(self.players)
         self.__current_turn_index = 0
-        await self.channel.send("Playing with a gun with {} chambers, {}.".format(self.__gun, "last man standing" if self.__last_man_standing else "one bullet"))
+        await self.send("Playing with a gun with {} chambers, {}.".format(self.__gun, "last man standing" if self.__last_man_standing else "one bullet"))
 
 
         pidx = 0
         for player in self.players:
             if pidx == self.__current_turn_index:
-                await self.channel.send("<@{0}>, you go first! Good luck!".format(player.id))
+                await self.send("<@{0}>, you go first! Good luck!".format(player.id))
             else:
-                await self.channel.send("<@{0}>, let\'s see what happens...".format(player.id))
+                await self.send("<@{0}>, let\'s see what happens...".format(player.id))
             pidx += 1
 
         await self.show()
@@ -88,19 +82,21 @@ class GameObject(Game):
     async def move(self, args, player):
         logger.debug('Checking turn...')
         if player != self.players[self.__current_turn_index]:
-            await self.channel.send('It is not your turn currently.')
+            await self.reject('It is not your turn currently.')
             return
         self.__shots += 1
         logger.debug("Getting number...")
-        if random.randint(1, self.__gun) == self.__gun // 2:
+        lethal = random.randint(1, self.__gun) == self.__gun // 2
+        self._journal_move(self.__current_turn_index, int(lethal))
+        if lethal:
             logger.debug("Will be a kill shot, sending message")
             # Oh no!
-            await self.channel.send("**{0}**  :skull::boom::gun:".format(self.get_current_player().name))
+            await self.send("**{0}**  :skull::boom::gun:".format(self.get_current_player().name))
             if not self.__last_man_standing:
                 logger.debug("Clearing game...")
                 await self.end_game()
                 logger.debug("Sending meta-data...")
-                await self.channel.send("**{0}** looses! It took {1} shots!".format(self.get_current_player().name, self.__shots))
+                await self.send("**{0}** looses! It took {1} shots!".format(self.get_current_player().name, self.__shots))
             else:
                 logger.debug("removing player and updating index")
                 self.players.remove(player)
@@ -109,7 +105,7 @@ class GameObject(Game):
                     logger.debug("Clearing game...")
                     await self.end_game()
                     logger.debug("Sending meta-data...")
-                    await self.channel.send("**{0}** wins! It took {1} shots!".format(self.players[0].name, self.__shots))
+                    await self.send("**{0}** wins! It took {1} shots!".format(self.players[0].name, self.__shots))
                 else:
                     self.__current_turn_index = (self.__current_turn_index - 1) % len(self.players)
                     logger.debug("Calling next turn...")
@@ -118,7 +114,7 @@ class GameObject(Game):
                     await self.show()
         else:
             logger.debug("Shot not lethal, click! Sending message")
-            await self.channel.send("**{0}**  :sunglasses::gun: *click*".format(self.get_current_player().name))
+            await self.send("**{0}**  :sunglasses::gun: *click*".format(self.get_current_player().name))
             logger.debug("Calling next turn...")
             self.next_turn()
             logger.debug("Showing board...")
@@ -130,6 +126,32 @@ class GameObject(Game):
     def get_current_player(self):
         return self.players[self.__current_turn_index]
 
+    def _journal_params(self):
+        return self.__gun, self.__last_man_standing
+
+    @staticmethod
+    def replay(params, players, moves):
+        gun, last_man_standing = params
+        alive = list(range(players))
+        for turn, lethal, _ in moves:
+            if lethal:
+                if not last_man_standing:
+                    break
+                alive.pop(turn)
+        return alive, alive[0] if last_man_standing and len(alive) == 1 else None
+
+    def _save_state(self, writer):
+        writer.u32(self.__shots)
+        writer.u16(self.__gun)
+        writer.bool(self.__last_man_standing)
+        writer.u8(self.__current_turn_index)
+
+    def _load_state(self, reader):
+        self.__shots = reader.u32()
+        self.__gun = reader.u16()
+        self.__last_man_standing = reader.bool()
+        self.__current_turn_index = reader.u8()
+
     async def show(self):
         board = "**{0}**  :triumph::gun:".format(self.get_current_player().name)
-        await self.channel.send(board)
+        await self.send(board)
@@ -1,42 +1,41 @@
-import datetime
-import logging
 import random
-import re
 
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility import TicTacToeTable
+from GameUtility.Board import GridBoard
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
+from GameUtility.WinDetector import find_winning_line
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Implements Tic-Tac-Toe
     """
 
+    EDIT_BOARD_IN_PLACE = True
+
     @staticmethod
     def get_game_name():
         return "TicTacToe"
 
     @staticmethod
     def how_to_play():
-        return "TicTacToe is a game played on a 3x3 grid. Each player gets an X or O token to place on a free square. The first player to get three of their tokens in a horizontal, diagonal, or vertical section wins the game. If all cells are filled the game is a draw."
+        return "TicTacToe is a game played on a 3x3 grid. Each player gets an X or O token to place on a free square. The first player to get three of their tokens in a horizontal, diagonal, or vertical section wins the game. If all cells are filled the game is a draw. Start a game by yourself to play against the bot."
 
     @staticmethod
     def get_game_short_name():
         return "TTT"
 
     async def setup(self, args):
-        self.__board = [['⬛', '⬛', '⬛'], ['⬛', '⬛', '⬛'], ['⬛', '⬛', '⬛']]
         self.__p1 = '❌'
         self.__p2 = '⭕'
+        self.__board = GridBoard(3, 3, ['⬛', self.__p1, self.__p2])
         self.__turns = 0
         self.__current_turn_index = 0
+        self.__bot_player = None
 
         logger.info('Setting up a TicTacToe game...')
         if len(args) > 0 or (len(args) == 1 and args[0].lower() == 'help'):
@@ -46,8 +45,9 @@ class GameObject(Game):
             logger.debug('Could not setup game, user provided too many users to play')
             return SetupFailure('Why are you trying to play TicTacToe with more than 1 person? That\'s not how this works...')
         elif len(self.players) < 2:
-            logger.debug('Could not setup game, user provided too few users to play')
-            return SetupFailure('You can\'t play TicTacToe by yourself.')
+            logger.debug('Only one user, filling the other seat with the bot')
+            self.__bot_player = self.bot.user
+            self.players = self.players + [self.__bot_player]
         logger.debug('Passed standard checks setting up turn...')
         random.shuffle(self.players)
         self.__current_turn_index = 0
@@ -56,73 +56,69 @@ class GameObject(Game):
         pidx = 0
         for player in self.players:
             if pidx == self.__current_turn_index:
-                await self.channel.send(f'{player.mention}, you go first! Good luck!')
+                await self.send(f'{player.mention}, you go first! Good luck!')
             else:
-                await self.channel.send(f'{player.mention}, waiting for your turn...')
+                await self.send(f'{player.mention}, waiting for your turn...')
             pidx += 1
 
+        if self.get_current_player() == self.__bot_player:
+            await self._bot_move()
+
         return SetupSuccess(self)
 
     async def move(self, args, player):
         logger.debug('Checking turn...')
         if player != self.players[self.__current_turn_index]:
-            await self.channel.send('It is not your turn currently.')
+            await self.reject('It is not your turn currently.')
             return
         logger.debug('Checking arguments...')
         if len(args) != 2:
-            await self.channel.send('You need to specify a valid position on the board. `>move [row] [col]`')
+            await self.reject('You need to specify a valid position on the board. `>move [row] [col]`')
         elif type(args[0]) != int or type(args[1]) != int:
-            await self.channel.send('Invalid position. Both arguments need to be numbers')
+            await self.reject('Invalid position. Both arguments need to be numbers')
         elif args[0] <= 0 or args[0] > 3 or args[1] <= 0 or args[1] > 3:
-            await self.channel.send('You need to specify a valid position on the board.')
-        elif self.__board[args[1] - 1][args[0] - 1] != '⬛':
-            await self.channel.send('That position is not empty. Please choose an empty spot.')
+            await self.reject('You need to specify a valid position on the board.')
+        elif not self.__board.is_empty(args[0] - 1, args[1] - 1):
+            await self.reject('That position is not empty. Please choose an empty spot.')
         else:
-            logger.debug('Setting position on board')
-            self.__board[args[1] - 1][args[0] - 1] = self.get_user_icon()
-            self.__turns += 1
-            """
-            First 3 checks: Horizontal Axis
-            Second 3 checks: Vertical Axis
-            Last 2 checks: Diagonal Axis
-            """
-            if self.__board[0][0] == '❌' and self.__board[0][1] == '❌' and self.__board[0][2] == '❌' or \
-               self.__board[1][0] == '❌' and self.__board[1][1] == '❌' and self.__board[1][2] == '❌' or \
-               self.__board[2][0] == '❌' and self.__board[2][1] == '❌' and self.__board[2][2] == '❌' or \
-               self.__board[0][0] == '❌' and self.__board[1][0] == '❌' and self.__board[2][0] == '❌' or \
-               self.__board[0][1] == '❌' and self.__board[1][1] == '❌' and self.__board[2][1] == '❌' or \
-               self.__board[0][2] == '❌' and self.__board[1][2] == '❌' and self.__board[2][2] == '❌' or \
-               self.__board[0][0] == '❌' and self.__board[1][1] == '❌' and self.__board[2][2] == '❌' or \
-               self.__board[0][2] == '❌' and self.__board[1][1] == '❌' and self.__board[2][0] == '❌':
-                await self.show()
-                logger.debug('Clearing game...')
-                await self.end_game()
-                logger.debug('Player 1 has won the game, sending message...')
-                await self.channel.send(f'**{self.get_current_player().name}** wins!')
-            elif self.__board[0][0] == '⭕' and self.__board[0][1] == '⭕' and self.__board[0][2] == '⭕' or \
-                 self.__board[1][0] == '⭕' and self.__board[1][1] == '⭕' and self.__board[1][2] == '⭕' or \
-                 self.__board[2][0] == '⭕' and self.__board[2][1] == '⭕' and self.__board[2][2] == '⭕' or \
-                 self.__board[0][0] == '⭕' and self.__board[1][0] == '⭕' and self.__board[2][0] == '⭕' or \
-                 self.__board[0][1] == '⭕' and self.__board[1][1] == '⭕' and self.__board[2][1] == '⭕' or \
-                 self.__board[0][2] == '⭕' and self.__board[1][2] == '⭕' and self.__board[2][2] == '⭕' or \
-                 self.__board[0][0] == '⭕' and self.__board[1][1] == '⭕' and self.__board[2][2] == '⭕' or \
-                 self.__board[0][2] == '⭕' and self.__board[1][1] == '⭕' and self.__board[2][0] == '⭕':
-                await self.show()
-                logger.debug('Clearing game...')
-                await self.end_game()
-                logger.debug('Player 2 has won the game, sending message...')
-                await self.channel.send(f'**{self.get_current_player().name}** wins!')
-            else:
-                logger.debug('User moved')
-                if self.__turns != 9:
-                    logger.debug('Calling next turn...')
-                    self.next_turn()
-                    await self.show()
-                else:
-                    logger.debug('Clearing game...')
-                    await self.show()
-                    await self.end_game()
-                    await self.channel.send('It\'s a draw!')
+            if not await self._place(args[0] - 1, args[1] - 1) and self.get_current_player() == self.__bot_player:
+                await self._bot_move()
+
+    async def _place(self, col, row):
+        """
+        Place the current player's icon at (col, row), then either finish the game or pass the turn. Returns True if
+        the game is over.
+        """
+        logger.debug('Setting position on board')
+        self.__board.set(col, row, self.__board.add_token(self.get_user_icon()))
+        self._journal_move(self.__current_turn_index, row * 3 + col)
+        self.__turns += 1
+        with self.measure('win_check_seconds'):
+            won = find_winning_line(self.__board, col, row, 3) is not None
+        if won:
+            await self.show()
+            logger.debug('Clearing game...')
+            await self.end_game()
+            logger.debug('Player {} has won the game, sending message...'.format(self.__current_turn_index + 1))
+            await self.send(f'**{self.get_current_player().name}** wins!')
+            return True
+        logger.debug('User moved')
+        if self.__turns != 9:
+            logger.debug('Calling next turn...')
+            self.next_turn()
+            await self.show()
+            return False
+        logger.debug('Clearing game...')
+        await self.show()
+        await self.end_game()
+        await self.send('It\'s a draw!')
+        return True
+
+    async def _bot_move(self):
+        # The board's cell codes (empty, first player, second player) are exactly what the table is keyed on
+        idx = TicTacToeTable.best_move(self.__board.cells)
+        logger.debug('Bot chose cell {}'.format(idx))
+        await self._place(idx % 3, idx // 3)
 
     def next_turn(self):
         self.__current_turn_index = (self.__current_turn_index + 1) % len(self.players)
@@ -136,6 +132,32 @@ class GameObject(Game):
     def get_current_player(self):
         return self.players[self.__current_turn_index]
 
+    @staticmethod
+    def replay(params, players, moves):
+        board = GridBoard(3, 3, ['⬛', '❌', '⭕'])
+        cells = board.cells
+        for player, idx, _ in moves:
+            cells[idx] = player + 1
+        winner = None
+        if moves:
+            player, idx, _ = moves[-1]
+            if find_winning_line(board, idx % 3, idx // 3, 3):
+                winner = player
+        return board, winner
+
+    def _save_state(self, writer):
+        writer.u8(self.__turns)
+        writer.u8(self.__current_turn_index)
+        writer.u8(self._player_index(self.__bot_player))
+        writer.board(self.__board)
+
+    def _load_state(self, reader):
+        self.__turns = reader.u8()
+        self.__current_turn_index = reader.u8()
+        self.__bot_player = self._player_at(reader.u8())
+        self.__board = reader.board()
+        self.__p1, self.__p2 = self.__board.tokens[1:3]
+
     async def show(self):
-        board = f'{"".join(self.__board[0])}\n{"".join(self.__board[1])}\n{"".join(self.__board[2])}'
-        await self.channel.send(board)
+        board = self.__board.render().strip('\n')
+        await self.send_board(board)
@@ -1,21 +1,16 @@
-import datetime
-import logging
+import asyncio
 import random
 import re
 
-from GenericUtility import Language
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility import WordIndex
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Implements Word Play
     """
@@ -26,7 +21,7 @@ class GameObject(Game):
 
     @staticmethod
     def how_to_play():
-        return "WordPlay is a game where you change some feature of a word in the Oxford dictionary. Each word play must either reorder the letters, insert a letter, or remove a letter; only one transformation is allowed. For example, proper word plays on the word **car** can be cat, bar, and care. Improper word plays are race, cares, and are."
+        return "WordPlay is a game where you change some feature of a word in the Oxford dictionary. Each word play must either reorder the letters, insert a letter, or remove a letter; only one transformation is allowed. For example, proper word plays on the word **car** can be cat, bar, and care. Improper word plays are race, cares, and are. Stuck? Use `>move hint` to get a suggestion. If no word can be played anymore, whoever played last wins."
 
     @staticmethod
     def get_game_short_name():
@@ -34,7 +29,7 @@ class GameObject(Game):
 
     async def setup(self, args):
         self.__words = []
-        self.__word_list = set(word.strip().lower() for word in Language.dictionary.split('\n'))
+        self.__word_list = WordIndex.get_index()
         self.__current_turn_index = 0
 
         logger.info('Setting up a TicTacToe game...')
@@ -52,9 +47,9 @@ class GameObject(Game):
         pidx = 0
         for player in self.players:
             if pidx == self.__current_turn_index:
-                await self.channel.send(f'{player.mention}, you\'ll go first! Give us a word to play!')
+                await self.send(f'{player.mention}, you\'ll go first! Give us a word to play!')
             else:
-                await self.channel.send(f'{player.mention}, please wait for the first word.')
+                await self.send(f'{player.mention}, please wait for the first word.')
             pidx += 1
 
         return SetupSuccess(self)
@@ -62,20 +57,31 @@ class GameObject(Game):
     async def move(self, args, player):
         logger.debug("Checking command move")
         if player != self.players[self.__current_turn_index]:
-            await self.channel.send('It is not your turn currently.')
+            await self.reject('It is not your turn currently.')
             return
         if len(args) == 0 or len(args) > 1 or args[0] == "help" or type(args[0]) != str:
             logger.debug("Invalid move or requested help, showing help menu...")
-            await self.channel.send("**Command \'move\' Usage:** `>move [word]`")
+            await self.reject("**Command \'move\' Usage:** `>move [word]` or `>move hint`")
+            return
+        if args[0] == "hint":
+            logger.debug("User requested a hint")
+            self._not_a_move()
+            await self._hint()
             return
 
         submitted_word = args[0]
         logger.debug("Got word \'{}\'".format(submitted_word))
         if not self.__words:
-            logger.debug("This is the first word. Setting...")
+            logger.debug("This is the first word. Checking it can be played on...")
+            # The words are only changed once the check, which awaits, has passed
+            if not await self._legal_plays([submitted_word]):
+                logger.debug("Nothing can be played from the first word, asking for another word...")
+                await self.reject("No word can be played from that one! Give me another.")
+                return
             self.__words.append(submitted_word)
             logger.debug("User has set the starting word!")
-            await self.channel.send("Okay everyone, let's word play ***{0}***".format(self.__words[-1]))
+            self._journal_move(self.__current_turn_index, 0, submitted_word)
+            await self.send("Okay everyone, let's word play ***{0}***".format(self.__words[-1]))
             logger.debug("Calling next turn...")
             self.next_turn()
             logger.debug("Showing board...")
@@ -84,28 +90,38 @@ class GameObject(Game):
             logger.debug("Checking word...")
             if submitted_word in self.__words:
                 logger.debug("Word has been used, asking for another word...")
-                await self.channel.send("That word has been used already! Give me another.")
+                await self.reject("That word has been used already! Give me another.")
             elif submitted_word not in self.__word_list:
                 logger.debug("Word is not in the dictionary... let them retry")
-                await self.channel.send("That word is not in my dictionary! Try another.")
+                await self.reject("That word is not in my dictionary! Try another.")
             elif self._is_rearange(self.__words[-1], submitted_word) or self._is_valid_play(self.__words[-1], submitted_word):
+                plays = await self._legal_plays(self.__words + [submitted_word])
                 self.__words.append(submitted_word)
+                self._journal_move(self.__current_turn_index, 0, submitted_word)
                 logger.debug("Word is good, the words are...")
                 logger.debug(str(self.__words))
+                if not plays:
+                    logger.debug("No words left to play, ending game...")
+                    await self.send("There are no words left to play from **{0}**!".format(submitted_word))
+                    logger.debug("Clearing game...")
+                    await self.end_game()
+                    logger.debug("Sending meta-data...")
+                    await self.send("**{0}** wins! {1} words were played! You started with {2} and ended at {3}".format(self.get_current_player().name, len(self.__words), self.__words[0], self.__words[-1]))
+                    return
                 logger.debug("calling next turn...")
                 self.next_turn()
                 logger.debug("Showing board...")
                 await self.show()
             else:
                 logger.debug("Word is not good, ending game...")
-                await self.channel.send("**{0}**  :face_palm: That is not a shuffle of letters or contains more than one change!".format(self.get_current_player().name))
+                await self.send("**{0}**  :face_palm: That is not a shuffle of letters or contains more than one change!".format(self.get_current_player().name))
                 logger.debug("Clearing game...")
                 await self.end_game()
                 logger.debug("Sending meta-data...")
                 if len(self.__words) > 1:
-                    await self.channel.send("**{0}** loses! {1} words were played! You started with {2} and ended at {3}".format(self.get_current_player().name, len(self.__words), self.__words[0], self.__words[-1]))
+                    await self.send("**{0}** loses! {1} words were played! You started with {2} and ended at {3}".format(self.get_current_player().name, len(self.__words), self.__words[0], self.__words[-1]))
                 else:
-                    await self.channel.send("**{0}** loses! {1} words were played!".format(self.get_current_player().name, len(self.__words)))
+                    await self.send("**{0}** loses! {1} words were played!".format(self.get_current_player().name, len(self.__words)))
 
     def next_turn(self):
         self.__current_turn_index = (self.__current_turn_index + 1) % len(self.players)
@@ -113,11 +129,44 @@ class GameObject(Game):
     def get_current_player(self):
         return self.players[self.__current_turn_index]
 
+    @staticmethod
+    def replay(params, players, moves):
+        # Who won depends on the dictionary, so only the words are rebuilt
+        return [word for _, _, word in moves], None
+
+    def _save_state(self, writer):
+        writer.u8(self.__current_turn_index)
+        writer.str_list(self.__words)
+
+    def _load_state(self, reader):
+        self.__current_turn_index = reader.u8()
+        self.__words = reader.str_list()
+        self.__word_list = WordIndex.get_index()
+
     async def show(self):
         if not self.__words:
-            await self.channel.send("**{0}** give me any word!".format(self.get_current_player().name))
+            await self.send("**{0}** give me any word!".format(self.get_current_player().name))
+        else:
+            await self.send("**{0}**, word play **{1}**".format(self.get_current_player().name, self.__words[-1]))
+
+    async def _legal_plays(self, words):
+        """
+        Return every word not in `words` that may be played on the last of them
+        """
+        # The neighbour index is built on first use, which takes a moment, so keep it off the event loop
+        graph = await asyncio.get_running_loop().run_in_executor(None, WordIndex.get_graph)
+        last = words[-1]
+        return [word for word in graph.neighbours(last) if word not in words and (self._is_rearange(last, word) or self._is_valid_play(last, word))]
+
+    async def _hint(self):
+        if not self.__words:
+            await self.send("Any word in my dictionary will do to start!")
+            return
+        plays = await self._legal_plays(self.__words)
+        if plays:
+            await self.send("**{0}**, try ***{1}***".format(self.get_current_player().name, random.choice(sorted(plays))))
         else:
-            await self.channel.send("**{0}**, word play **{1}**".format(self.get_current_player().name, self.__words[-1]))
+            await self.send("I can't think of anything either...")
 
     def _is_rearange(self, word1, word2):
         if len(word1) == len(word2):
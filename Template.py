@@ -1,18 +1,11 @@
-import datetime
-import logging
-
-from GameParent import Game
 from GameParent import SetupFailure, SetupSuccess
+from GameUtility.GameBase import GameBase
+from GameUtility.GameLogging import get_logger
 
-logger = logging.getLogger(__name__)
-handler = logging.FileHandler('../logs/{}.log'.format(str(datetime.datetime.now()).replace(' ', '_').replace(':', 'h', 1).replace(':', 'm').split('.')[0][:-2]))
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(name)s::%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+logger = get_logger(__name__)
 
 
-class GameObject(Game):
+class GameObject(GameBase):
     """
     Every game must have the same class name, GameObject. Do not change the name or inheritance unless it extends a
     Game object somewhere in the chain. As a GameObject...
@@ -21,6 +14,8 @@ class GameObject(Game):
         - self.players          ||  Property: Return a list of discord.Member or discord.User objects that subscribed to the game
         - self.bot              ||  Property: Return the discord.Bot object for getting user info or other discord details
         - self.channel          ||  Property: Return the discord.Channel object for sending messages
+        - await self.send(text) ||  Method:   Send a message to the channel. Everything sent during one setup/move is batched into as few messages as possible
+        - await self.send_board(text) || Method: Send the game board. Set EDIT_BOARD_IN_PLACE = True to edit one board message instead of posting a new one each turn
         - await self.end_game() ||  Method:   Notify the ending of this game
 
     ** You MUST implement the following definitions:
@@ -87,7 +82,7 @@ class GameObject(Game):
         # TODO: Define some logic for transforming your game to a string
         board = "<some game state for formatted string here>"
         # Send the state of the game to the channel where the game is being hosted
-        await self.channel.send(board)
+        await self.send_board(board)
 
     # Not implemented, allowing game to end for all when a resign occurs. Change this if you allow users to resign mid-game
     # async def handle_user_leave(self, channel, player):